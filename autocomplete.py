@@ -0,0 +1,90 @@
+import bisect
+
+from strings import *
+from gururegistry import normalizeSignature
+from matchtable import GURU_COLORS, MatchTable
+
+class PrefixIndex:
+    """
+    Sorted array of search keys answering prefix queries with a binary search.
+
+    Args:
+        entries: An iterable of 4-tuples
+            key: The normalized string typed text is matched against
+            rank: Sort order of the suggestion among other matches
+            value: The value submitted when the suggestion is picked
+            name: What the suggestion is shown as
+        scanLimit: The most keys a single query looks at, so very short prefixes stay fast
+    """
+    def __init__(self, entries, scanLimit: int=500):
+        self.entries = sorted(entries, key=lambda entry: entry[0])
+        self.keys = [entry[0] for entry in self.entries]
+        self.scanLimit = scanLimit
+
+    def search(self, prefix: str, limit: int=25):
+        """
+        Returns up to limit (name, value) pairs whose key starts with prefix, in rank order and without repeated values.
+        """
+        start = bisect.bisect_left(self.keys, prefix)
+        found = {}
+        for key, rank, value, name in self.entries[start:start + self.scanLimit]:
+            if (not key.startswith(prefix)): break
+            if (value not in found): found[value] = (rank, name)
+        ranked = sorted(found.items(), key=lambda item: item[1][0])
+        return [(name, value) for value, (rank, name) in ranked[:limit]]
+
+def compactKey(text: str):
+    """Normalizes typed text into the uppercase, spaceless form prefix index keys use."""
+    return "".join(str(text).upper().split())
+
+def podAliases(podLetter: str, podNumber: str):
+    """Returns every compact spelling of a pod ID that parsePodID accepts, such as NII, N2, NOVICEII and NOVICE2."""
+    letterNames = [podLetter, LETTER2NAME[podLetter].upper()]
+    if (podLetter == "E"):
+        return letterNames + ["EX"]
+    arabic = [number for number, roman in NUMBER2ROMAN.items() if roman == podNumber]
+    return [name + number for name in letterNames for number in [podNumber] + arabic]
+
+def podRank(podLetter: str, podNumber: str):
+    numbers = ["0"] + PODNUMBERS
+    return (PODLETTERS.index(podLetter) if podLetter in PODLETTERS else len(PODLETTERS), numbers.index(podNumber) if podNumber in numbers else len(numbers))
+
+def splitFID(fid: str):
+    """Splits a full match ID such as "N II 113" into its pod letter, pod number and match number, or returns None if it is malformed."""
+    chunks = str(fid).split(" ")
+    if (len(chunks) != 3 or chunks[0] not in LETTER2NAME): return None
+    return chunks[0], chunks[1], chunks[2]
+
+def buildMatchPrefixIndex(allMatches: MatchTable):
+    """Builds a PrefixIndex of every match, submitting match IDs in a form parseMatchID accepts."""
+    entries = []
+    for fid, deckA, deckB in zip(allMatches.column('FID'), allMatches.column('P1Deck'), allMatches.column('P2Deck')):
+        parts = splitFID(fid)
+        if (parts is None): continue
+        podLetter, podNumber, matchNumber = parts
+        value = f"E {matchNumber}" if podLetter == "E" else fid
+        fullName = LETTER2NAME[podLetter] + ("" if podLetter == "E" else " " + podNumber) + " " + matchNumber
+        name = f"{fullName}: {deckA} vs {deckB}"[:100]
+        rank = podRank(podLetter, podNumber) + (int(matchNumber) if matchNumber.isnumeric() else 0,)
+        for alias in podAliases(podLetter, podNumber):
+            entries.append((alias + matchNumber, rank, value, name))
+    return PrefixIndex(entries)
+
+def buildPodPrefixIndex(allMatches: MatchTable):
+    """Builds a PrefixIndex of every pod, submitting pod IDs in a form parsePodID accepts."""
+    entries = []
+    pods = {parts[:2] for parts in map(splitFID, allMatches.column('FID')) if parts is not None}
+    for podLetter, podNumber in pods:
+        value = podLetter if podLetter == "E" else podLetter + " " + podNumber
+        name = LETTER2NAME[podLetter] + ("" if podLetter == "E" else " " + podNumber)
+        for alias in podAliases(podLetter, podNumber):
+            entries.append((alias, podRank(podLetter, podNumber), value, name))
+    return PrefixIndex(entries)
+
+def buildGuruPrefixIndex(allMatches: MatchTable):
+    """Builds a PrefixIndex of every guru signed up for any match, keyed by casefolded signature."""
+    gurus = {}
+    for color in GURU_COLORS:
+        for guru in dict.fromkeys(str(guru).strip() for guru in allMatches.column(color+'Guru')):
+            if (guru != ""): gurus.setdefault(normalizeSignature(guru), guru)
+    return PrefixIndex((key, key, guru, guru[:100]) for key, guru in gurus.items())
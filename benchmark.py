@@ -0,0 +1,204 @@
+"""
+Benchmarks every Memknight command against a synthetic tournament, without touching Discord or Google.
+
+The data and guruData sheets are generated at the requested size and served by FakeWorksheet, which answers the
+gspread calls the bot makes after a configurable delay. Each command is then run by its real handler in main.py,
+many times at once, and its latency, Sheets calls and the peak memory it allocates on top of what was already in use are reported.
+
+    python benchmark.py --pods 12 --matches 400 --gurus 80 --latency 0.3 --concurrency 20 --rounds 5
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault('GUILD_ID', '1')
+os.environ.setdefault('MATCH_THREADS_ID', '2')
+os.environ.setdefault('HUB_KEY', 'hub')
+os.environ.setdefault('SHEET_KEY', 'sheet')
+
+import main
+from fakesheets import THREAD_IDS, FakeWorksheet, generateTournament, podCodes
+from matchstore import MatchStore
+from sheetio import AsyncWorksheet, SheetScheduler
+
+class FakeMessage:
+    async def edit(self, **kwargs):
+        pass
+
+class FakeResponse:
+    def __init__(self):
+        self.done = False
+
+    def is_done(self):
+        return self.done
+
+    async def send_message(self, content=None, **kwargs):
+        self.done = True
+
+    async def defer(self, **kwargs):
+        self.done = True
+
+    async def edit_message(self, **kwargs):
+        self.done = True
+
+class FakeFollowup:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, content=None, **kwargs):
+        self.sent.append(content)
+        return FakeMessage()
+
+class FakeChannel:
+    def __init__(self, id: int, parent_id: int):
+        self.id = id
+        self.parent_id = parent_id
+
+    async def send(self, content=None, **kwargs):
+        return FakeMessage()
+
+class FakePermissions:
+    def __init__(self, administrator: bool):
+        self.administrator = administrator
+
+class FakeUser:
+    def __init__(self, id: int, administrator: bool=True):
+        self.id = id
+        self.guild_permissions = FakePermissions(administrator)
+
+class FakeInteraction:
+    """The parts of a discord.Interaction the command handlers use, run from a thread in guru-match-help of the first tenant's server."""
+    def __init__(self, userID: int, threadID: int):
+        self.guild_id = main.GUILDS[0].id
+        self.user = FakeUser(userID)
+        self.channel = FakeChannel(threadID, main.tenants[self.guild_id].threadsChannelID)
+        self.channel_id = threadID
+        self.response = FakeResponse()
+        self.followup = FakeFollowup()
+
+    async def delete_original_response(self):
+        pass
+
+def commandCallback(name: str):
+    return main.client.tree.get_command(name, guild=main.GUILDS[0]).callback
+
+def buildDrivers(pods: list, matches: int, gurus: int):
+    """
+    Returns a dictionary of command name to a function that runs it once with random arguments.
+    Each function takes a random.Random and returns an awaitable.
+    """
+    def matchID(rng):
+        return f"{rng.choice(pods)} {rng.randint(1, matches)}"
+    def rangeID(rng):
+        first = rng.randint(1, max(matches - 15, 1))
+        return f"{rng.choice(pods)} {first}-{min(first + 15, matches)}"
+    def guru(rng):
+        return f"guru{rng.randrange(gurus)}"
+    def interaction(rng):
+        return FakeInteraction(10**17 + rng.randrange(gurus), rng.choice(THREAD_IDS))
+    def call(name, **kwargs):
+        return lambda rng: commandCallback(name)(interaction(rng), **{key: value(rng) if callable(value) else value for key, value in kwargs.items()})
+    return {
+        "getmatch": call("getmatch", matchid=matchID),
+        "peekmatch": call("peekmatch", matchid=matchID),
+        "getmatch range": call("getmatch", matchid=rangeID),
+        "pingmatch": call("pingmatch", matchid=matchID),
+        "pingmatch range": call("pingmatch", matchid=rangeID),
+        "summary": call("summary", podid=lambda rng: rng.choice(pods)),
+        "summaryall": call("summaryall"),
+        "gurusummary": call("gurusummary", guru=guru),
+        "inverseerrors": call("inverseerrors"),
+        "checklinked": call("checklinked"),
+        "tlink": call("tlink", matchid=matchID),
+        "writeup": call("writeup", matchid=matchID),
+        "ulink": call("ulink", matchid=matchID),
+        "changes": call("changes", since="1h"),
+        "registerguru": call("registerguru", signature=lambda rng: f"newguru{rng.randrange(10**6)}"),
+        "unregisterguru": call("unregisterguru", signature=guru),
+        "mysignatures": call("mysignatures"),
+        "discrepancyurl": call("discrepancyurl"),
+        "stats": call("stats", section="Everything"),
+        "help": call("help", command="getmatch"),
+        "autocomplete matchid": lambda rng: main.matchIdAutocomplete(interaction(rng), rng.choice(pods)[:3]),
+        "autocomplete guru": lambda rng: main.guruAutocomplete(interaction(rng), "guru1"),
+    }
+
+def percentile(samples: list, fraction: float):
+    ordered = sorted(samples)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+async def benchmark(args):
+    dataValues, guruValues = generateTournament(args.pods, args.matches, args.gurus, args.seed)
+    dataSheet = FakeWorksheet(dataValues, args.latency, "data")
+    guruSheet = FakeWorksheet(guruValues, args.latency, "guruData")
+    executor = ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="sheets")
+    scheduler = SheetScheduler(requestsPerMinute=args.quota) if args.quota else None
+    tenant = main.tenants[main.GUILDS[0].id]
+    tenant.store = MatchStore(
+        AsyncWorksheet(dataSheet, executor, scheduler), AsyncWorksheet(guruSheet, executor, scheduler),
+        refreshInterval=args.refresh, ttl=args.ttl, writeWindow=args.write_window
+    )
+    await tenant.store.start()
+    pods = podCodes(args.pods)
+    drivers = buildDrivers(pods, args.matches, args.gurus)
+    selected = args.commands.split(",") if args.commands else list(drivers)
+    rng = random.Random(args.seed)
+    if (args.memory): tracemalloc.start()
+    lines = [f"{len(dataValues) - 1} matches in {args.pods} pods, {args.gurus} gurus, {args.latency * 1000:.0f} ms Sheets latency, {args.concurrency} concurrent x {args.rounds} rounds"]
+    lines.append(f"{'command':<22}{'p50 ms':>10}{'p99 ms':>10}{'calls/cmd':>11}{'peak MB':>10}{'errors':>8}")
+    for name in selected:
+        latencies = []
+        errors = 0
+        callsBefore = sum(dataSheet.calls.values()) + sum(guruSheet.calls.values())
+        if (args.memory):
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        for round in range(args.rounds):
+            async def timed(run):
+                start = time.perf_counter()
+                try:
+                    await run
+                except Exception:
+                    return None
+                return time.perf_counter() - start
+            results = await asyncio.gather(*[timed(drivers[name](rng)) for invocation in range(args.concurrency)])
+            latencies += [result for result in results if result is not None]
+            errors += sum(result is None for result in results)
+        invocations = args.rounds * args.concurrency
+        calls = sum(dataSheet.calls.values()) + sum(guruSheet.calls.values()) - callsBefore
+        peak = f"{(tracemalloc.get_traced_memory()[1] - baseline) / 2**20:.1f}" if args.memory else "-"
+        if (latencies): lines.append(f"{name:<22}{percentile(latencies, 0.5) * 1000:>10.2f}{percentile(latencies, 0.99) * 1000:>10.2f}{calls / invocations:>11.2f}{peak:>10}{errors:>8}")
+        else: lines.append(f"{name:<22}{'-':>10}{'-':>10}{calls / invocations:>11.2f}{peak:>10}{errors:>8}")
+    lines.append(f"Sheets calls: data {dict(dataSheet.calls)}, guruData {dict(guruSheet.calls)}")
+    return "\n".join(lines)
+
+def parseArgs(argv: list):
+    parser = argparse.ArgumentParser(description="Benchmark Memknight's commands against a synthetic tournament")
+    parser.add_argument("--pods", type=int, default=12, help="pods in the tournament, including Exemplar")
+    parser.add_argument("--matches", type=int, default=400, help="matches in each pod")
+    parser.add_argument("--gurus", type=int, default=80, help="gurus signed up for matches")
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds each Sheets call takes")
+    parser.add_argument("--concurrency", type=int, default=20, help="invocations of a command run at once")
+    parser.add_argument("--rounds", type=int, default=5, help="batches of concurrent invocations per command")
+    parser.add_argument("--commands", default="", help="comma separated commands to run, defaulting to all")
+    parser.add_argument("--ttl", type=float, default=300, help="seconds a snapshot is served before a command refreshes it")
+    parser.add_argument("--refresh", type=float, default=60, help="seconds between background refreshes")
+    parser.add_argument("--write-window", type=float, default=0.5, help="seconds writes are gathered before flushing")
+    parser.add_argument("--quota", type=float, default=0, help="Sheets calls per minute to allow, or 0 for no limit")
+    parser.add_argument("--workers", type=int, default=4, help="threads making Sheets calls")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the tournament and command arguments")
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="skip tracing peak memory, which slows every command")
+    parser.add_argument("--output", default="bench_output.txt", help="file the report is also written to")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parseArgs(sys.argv[1:])
+    report = asyncio.run(benchmark(args))
+    print(report)
+    with open(args.output, "w", encoding="utf-8") as output:
+        output.write(report + "\n")
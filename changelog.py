@@ -0,0 +1,191 @@
+import bisect
+import re
+import time
+from collections import deque
+
+from strings import *
+from gururegistry import normalizeSignature
+from matchtable import GURU_COLORS, MatchTable
+from autocomplete import splitFID
+from parsefuncts import parsePodID, paginateLines
+
+RESULT_ENTERED = "result entered"
+RESULT_CLEARED = "result cleared"
+DISCREPANCY_RAISED = "discrepancy raised"
+DISCREPANCY_RESOLVED = "discrepancy resolved"
+MATCH_COMPLETED = "match completed"
+THREAD_LINKED = "thread linked"
+THREAD_UNLINKED = "thread unlinked"
+
+COLOR2EMOJI = {
+    "R": EMOJI_R,
+    "U": EMOJI_U,
+    "G": EMOJI_G
+}
+
+class MatchChange:
+    """
+    One row-level change between two consecutive match snapshots.
+
+    Args:
+        at: Unix time the change was seen
+        fid: Full match ID of the changed match, such as "N II 113"
+        pod: Pod code of the match, such as "N II" or "E"
+        kind: One of the change kinds defined in this module
+        value: The new result or thread ID, if the kind has one
+        color: One of GURU_COLORS for result changes, otherwise None
+        gurus: Signatures of the gurus the change concerns
+    """
+    def __init__(self, at: float, fid: str, pod: str, kind: str, value=None, color: str=None, gurus: list=()):
+        self.at = at
+        self.fid = fid
+        self.pod = pod
+        self.kind = kind
+        self.value = value
+        self.color = color
+        self.gurus = [guru for guru in gurus if guru != ""]
+
+def diffMatches(before: MatchTable, after: MatchTable, changedRows: set=None, at: float=None):
+    """
+    Lists the changes between two MatchTables of match result data.
+
+    Args:
+        before: The older MatchTable
+        after: The newer MatchTable
+        changedRows: Row positions that may differ, or None to compare every row
+        at: Unix time to stamp the changes with, defaulting to now
+
+    Returns:
+        A list of MatchChange in row order. Nothing is listed if the sheet's rows were rearranged.
+    """
+    at = time.time() if at is None else at
+    if (len(before) != len(after)): return []
+    if (changedRows is None):
+        changedRows = [row for row, (old, new) in enumerate(zip(before, after)) if old != new]
+    changes = []
+    for row in sorted(changedRows):
+        if (row >= len(after)): continue
+        old, new = before[row], after[row]
+        fid = str(new.FID)
+        if (str(old.FID) != fid): continue
+        pod = str(new.PID)
+        gurus = {color: str(getattr(new, color+'Guru')).strip() for color in GURU_COLORS}
+        for color in GURU_COLORS:
+            oldResult, newResult = str(getattr(old, color+'Rs')), str(getattr(new, color+'Rs'))
+            if (oldResult == newResult): continue
+            kind = RESULT_ENTERED if newResult != "" else RESULT_CLEARED
+            changes.append(MatchChange(at, fid, pod, kind, newResult, color, [gurus[color]]))
+        if (old.Des != new.Des):
+            kind = DISCREPANCY_RAISED if new.Des == 1 else DISCREPANCY_RESOLVED
+            changes.append(MatchChange(at, fid, pod, kind, str(new.Rst), gurus=gurus.values()))
+        elif (old.InDs == 1 and new.InDs != 1):
+            changes.append(MatchChange(at, fid, pod, MATCH_COMPLETED, str(new.Rst), gurus=gurus.values()))
+        if (str(old.TLink) != str(new.TLink)):
+            link = str(new.TLink)
+            kind = THREAD_LINKED if link not in ("", "0") else THREAD_UNLINKED
+            changes.append(MatchChange(at, fid, pod, kind, link if kind == THREAD_LINKED else str(old.TLink), gurus=gurus.values()))
+    return changes
+
+class ChangeLog:
+    """
+    Bounded ring buffer of recent MatchChanges, indexed by pod and by guru.
+
+    Every index is a ring buffer of its own holding at most maxChanges entries, so a quiet pod keeps its history
+    even after busier pods have pushed it out of the full log.
+
+    Args:
+        maxChanges: The most changes each buffer keeps
+    """
+    def __init__(self, maxChanges: int=2000):
+        self.maxChanges = maxChanges
+        self.changes = deque(maxlen=maxChanges)
+        self.byPod = {}
+        self.byGuru = {}
+
+    def record(self, changes: list):
+        """Adds changes to the log. They must be no older than the changes already in it."""
+        for change in changes:
+            self.changes.append(change)
+            self.byPod.setdefault(change.pod, deque(maxlen=self.maxChanges)).append(change)
+            for guru in {normalizeSignature(guru) for guru in change.gurus}:
+                self.byGuru.setdefault(guru, deque(maxlen=self.maxChanges)).append(change)
+
+    def since(self, at: float, podCode: str=None, guru: str=None):
+        """
+        Returns the changes seen at or after a time, oldest first.
+
+        Args:
+            at: Unix time to list changes from
+            podCode: If given, only changes to matches in this pod
+            guru: If given, only changes concerning this guru, in any case or spacing
+        """
+        if (guru is not None): changes = self.byGuru.get(normalizeSignature(guru), ())
+        elif (podCode is not None): changes = self.byPod.get(podCode, ())
+        else: changes = self.changes
+        changes = list(changes)
+        changes = changes[bisect.bisect_left([change.at for change in changes], at):]
+        if (guru is not None and podCode is not None): changes = [change for change in changes if change.pod == podCode]
+        return changes
+
+def parseSince(input: str, now: float=None):
+    """
+    Parses strings as a point in time to list changes from.
+
+    Args:
+        input: A duration ago such as 30m, 2h, 1d or 1h30m, a Discord timestamp such as <t:1700000000:R>, or a Unix time
+        now: Unix time durations are counted back from, defaulting to now
+
+    Returns:
+        The Unix time, or -1 if the string fails to parse.
+    """
+    now = time.time() if now is None else now
+    text = input.strip().lower()
+    timestamp = re.fullmatch(r"<t:(\d+)(:\w)?>|(\d{9,})", text)
+    if (timestamp): return float(timestamp.group(1) or timestamp.group(3))
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    parts = re.findall(r"(\d+)\s*([smhd])", text)
+    if (len(parts) == 0 or re.sub(r"[\d\ssmhd]", "", text) != ""): return -1
+    return now - sum(int(amount) * units[unit] for amount, unit in parts)
+
+def matchName(fid: str):
+    """Returns the full name of a match, such as Novice II 113 or Exemplar 97, from its FID."""
+    parts = splitFID(fid)
+    if (parts is None): return fid
+    podLetter, podNumber, matchNumber = parts
+    return LETTER2NAME[podLetter] + ("" if podLetter == "E" else " " + podNumber) + " " + matchNumber
+
+def changeLine(change: MatchChange):
+    """Formats a MatchChange as one listing line, starting with a newline."""
+    line = f"\n- <t:{int(change.at)}:R> {matchName(change.fid)}: "
+    if (change.kind == RESULT_ENTERED):
+        guru = change.gurus[0] if change.gurus else "**None**"
+        return line + f"{COLOR2EMOJI[change.color]} `{RESULT2EMOJI.get(change.value, '⚪ -')}` {guru}"
+    if (change.kind == RESULT_CLEARED):
+        return line + f"{COLOR2EMOJI[change.color]} result cleared"
+    if (change.kind == DISCREPANCY_RESOLVED):
+        return line + f"discrepancy resolved as {RESULT2STRING.get(change.value, change.value)}"
+    if (change.kind == MATCH_COMPLETED):
+        return line + f"completed as {RESULT2STRING.get(change.value, change.value)}"
+    if (change.kind == THREAD_LINKED):
+        return line + f"linked to <#{change.value}>"
+    if (change.kind == THREAD_UNLINKED):
+        return line + f"unlinked from <#{change.value}>"
+    return line + change.kind
+
+def formatChangePages(headerString: str, changes: list, pageLimit: int=2000):
+    """
+    Lists changes grouped by pod in discord message pages.
+
+    Args:
+        headerString: The string to start every page with
+        changes: A list of MatchChange, oldest first
+        pageLimit: The most characters a page may have
+
+    Returns:
+        A list of page strings.
+    """
+    pods = {}
+    for change in changes:
+        pods.setdefault(change.pod, []).append(changeLine(change))
+    sections = [(f"\n**{parsePodID(pod)[2]}**", lines) for pod, lines in pods.items()]
+    return paginateLines(headerString, sections, pageLimit)
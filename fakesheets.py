@@ -0,0 +1,126 @@
+"""
+Synthetic tournament sheets and an in-process stand-in for gspread worksheets, shared by the benchmark and the tests.
+"""
+import time
+import random
+from collections import Counter
+
+from gspread.utils import a1_to_rowcol, numericise_all
+
+from strings import PODLETTERS, PODNUMBERS
+from gururegistry import EMPTY_SIGNATURE, EMPTY_GURUID
+
+DATA_HEADER = [
+    'FID', 'PID', 'NID', 'IVID', 'P1Deck', 'P2Deck',
+    'RGuru', 'RRs', 'UGuru', 'URs', 'GGuru', 'GRs',
+    'Rst', 'RGu', 'UGu', 'GGu', 'InDs', 'Inc', 'Des',
+    'Notes', 'Updated', 'TLink'
+]
+GURU_HEADER = ['NAME', 'GURUID']
+THREAD_IDS = range(10**18, 10**18 + 500)
+
+def podCodes(count: int):
+    """Returns count pod codes in sheet order, such as N I, N II, ..., A I, ..., always ending with the Exemplar pod."""
+    codes = [letter + " " + number for letter in PODLETTERS if letter != "E" for number in PODNUMBERS]
+    return codes[:max(count - 1, 0)] + ["E"]
+
+def generateTournament(pods: int, matches: int, gurus: int, seed: int=0):
+    """
+    Generates the cells of a data and a guruData worksheet for a synthetic tournament.
+
+    Args:
+        pods: Number of pods, the last of which is the Exemplar pod
+        matches: Number of matches in each pod. Matches are paired with their inverse, 1 with 2, 3 with 4 and so on
+        gurus: Number of gurus signing up for matches. Half of them register a Discord ID
+        seed: Seed for the random results, so runs are repeatable
+
+    Returns:
+        Returns a 2-tuple of lists of rows of cell strings, each starting with its header
+            dataValues: The data worksheet
+            guruValues: The guruData worksheet, with free rows after the registered gurus
+    """
+    rng = random.Random(seed)
+    names = [f"guru{number}" for number in range(gurus)]
+    dataValues = [DATA_HEADER]
+    for pod in podCodes(pods):
+        podLetter = pod.split(" ")[0]
+        podNumber = pod.split(" ")[1] if podLetter != "E" else "0"
+        for matchNumber in range(1, matches + 1):
+            inverse = matchNumber + 1 if matchNumber % 2 else matchNumber - 1
+            results = [rng.choice(["0", "0.5", "1", "1", ""]) for color in range(3)]
+            filled = [result for result in results if result != ""]
+            if (len(filled) < 3): overall = "Incomplete"
+            elif (len(set(filled)) > 1): overall = "Discrepancy"
+            else: overall = filled[0]
+            inc, des = int(overall == "Incomplete"), int(overall == "Discrepancy")
+            link = str(rng.choice(THREAD_IDS)) if rng.random() < 0.2 else "0"
+            row = {
+                'FID': f"{podLetter} {podNumber} {matchNumber}", 'PID': pod, 'NID': str(matchNumber), 'IVID': str(inverse),
+                'P1Deck': f"deck{rng.randrange(matches)}", 'P2Deck': f"deck{rng.randrange(matches)}",
+                'RGuru': rng.choice(names), 'RRs': results[0], 'UGuru': rng.choice(names), 'URs': results[1], 'GGuru': rng.choice(names), 'GRs': results[2],
+                'Rst': overall, 'RGu': str(int(results[0] == "")), 'UGu': str(int(results[1] == "")), 'GGu': str(int(results[2] == "")),
+                'InDs': str(inc or des), 'Inc': str(inc), 'Des': str(des), 'Notes': "", 'Updated': "", 'TLink': link
+            }
+            dataValues.append([row[name] for name in DATA_HEADER])
+    guruValues = [GURU_HEADER]
+    guruValues += [[name, str(10**17 + number)] for number, name in enumerate(names[:gurus // 2])]
+    guruValues += [[EMPTY_SIGNATURE, EMPTY_GURUID] for free in range(gurus + 100)]
+    return dataValues, guruValues
+
+class FakeWorksheet:
+    """
+    In-process stand-in for the gspread Worksheet calls the bot makes, holding the sheet as rows of strings.
+
+    Every call sleeps for latency seconds on the calling thread, as a real request to Google would, and is counted in calls.
+
+    Args:
+        values: Rows of cell strings, starting with the header
+        latency: Seconds each call takes
+        title: Name of the worksheet
+    """
+    def __init__(self, values: list, latency: float=0, title: str="data"):
+        self.values = [list(row) for row in values]
+        self.latency = latency
+        self.title = title
+        self.calls = Counter()
+
+    def _request(self, name: str):
+        self.calls[name] += 1
+        if (self.latency > 0): time.sleep(self.latency)
+
+    def _cell(self, row: int, col: int):
+        if (row > len(self.values) or col > len(self.values[row - 1])): return ""
+        return self.values[row - 1][col - 1]
+
+    def _write(self, row: int, col: int, value):
+        while (len(self.values) < row): self.values.append([])
+        cells = self.values[row - 1]
+        while (len(cells) < col): cells.append("")
+        cells[col - 1] = str(value)
+
+    def get_all_values(self, **kwargs):
+        self._request("get_all_values")
+        return [list(row) for row in self.values]
+
+    def get_all_records(self, **kwargs):
+        self._request("get_all_records")
+        header = self.values[0]
+        return [dict(zip(header, numericise_all(row, empty2zero=False, default_blank=""))) for row in self.values[1:]]
+
+    def batch_get(self, ranges, major_dimension: str="ROWS", **kwargs):
+        self._request("batch_get")
+        valueRanges = []
+        for rangeName in ranges:
+            col = a1_to_rowcol(rangeName.split(":")[0])[1]
+            column = [self._cell(row, col) for row in range(1, len(self.values) + 1)]
+            while (column and column[-1] == ""): column.pop()
+            valueRanges.append([column] if major_dimension == "COLUMNS" else [[value] for value in column])
+        return valueRanges
+
+    def batch_update(self, data: list, **kwargs):
+        self._request("batch_update")
+        for update in data:
+            startRow, startCol = a1_to_rowcol(update["range"].split(":")[0])
+            for rowOffset, rowValues in enumerate(update["values"]):
+                for colOffset, value in enumerate(rowValues):
+                    self._write(startRow + rowOffset, startCol + colOffset, value)
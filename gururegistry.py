@@ -0,0 +1,120 @@
+import asyncio
+import heapq
+import time
+
+EMPTY_SIGNATURE = "###"
+EMPTY_GURUID = "0"
+
+REGISTERED = "registered"
+UNREGISTERED = "unregistered"
+ALREADY_REGISTERED = "already registered"
+NOT_REGISTERED = "not registered"
+NOT_OWNER = "not owner"
+REGISTRY_FULL = "registry full"
+
+def normalizeSignature(signature):
+    """
+    Normalizes a guru signature the same way /registerguru saves it, so lookups are not case or whitespace sensitive.
+    """
+    return str(signature).strip().casefold()
+
+class GuruRegistry:
+    """
+    In-memory copy of the guruData worksheet, mapping guru signatures to Discord IDs and back.
+
+    Loaded from the sheet once, then kept current by applying /registerguru and /unregisterguru in place.
+    Also tracks the sheet row of every taken signature and the free "###" rows, so registrations never have to search the sheet.
+    Writers must hold writeLock from checking a signature until they have applied their change here, so two registrations can not claim the same row.
+    """
+    def __init__(self):
+        self.sigToID = {}
+        self.idToSigs = {}
+        self.sigToRow = {}
+        self.freeRows = []
+        self.version = 0
+        self.fetchedAt = None
+        self.fromDisk = False
+        self.writeLock = asyncio.Lock()
+
+    def load(self, records: list, version: int, fromDisk: bool=False):
+        """
+        Replaces the registry contents with the rows of the guruData worksheet.
+
+        Args:
+            records: The guruData rows as returned by get_all_records, with NAME and GURUID columns
+            version: Increasing number identifying this download
+            fromDisk: Whether the rows come from a saved snapshot rather than the sheet
+        """
+        sigToID = {}
+        idToSigs = {}
+        sigToRow = {}
+        freeRows = []
+        for index, record in enumerate(records):
+            row = index + 2
+            signature = normalizeSignature(record.get('NAME', ""))
+            if (signature == EMPTY_SIGNATURE):
+                freeRows.append(row)
+                continue
+            if (signature == "" or signature in sigToID): continue
+            guruID = str(record.get('GURUID', EMPTY_GURUID))
+            sigToID[signature] = guruID
+            idToSigs.setdefault(guruID, []).append(signature)
+            sigToRow[signature] = row
+        heapq.heapify(freeRows)
+        self.sigToID = sigToID
+        self.idToSigs = idToSigs
+        self.sigToRow = sigToRow
+        self.freeRows = freeRows
+        self.version = version
+        self.fetchedAt = time.monotonic()
+        self.fromDisk = fromDisk
+
+    def exportRecords(self):
+        """Returns the registry as guruData rows in the same form load takes, for saving to disk."""
+        rows = {row: {'NAME': signature, 'GURUID': self.sigToID[signature]} for signature, row in self.sigToRow.items()}
+        for row in self.freeRows:
+            rows[row] = {'NAME': EMPTY_SIGNATURE, 'GURUID': EMPTY_GURUID}
+        lastRow = max(rows, default=1)
+        return [rows.get(row, {'NAME': "", 'GURUID': ""}) for row in range(2, lastRow + 1)]
+
+    def isLoaded(self):
+        return self.fetchedAt is not None
+
+    def getID(self, signature: str):
+        """Returns the Discord ID registered to a signature, or None if it is not registered."""
+        return self.sigToID.get(normalizeSignature(signature))
+
+    def getSignatures(self, guruID):
+        """Returns every signature registered to a Discord ID."""
+        return list(self.idToSigs.get(str(guruID), []))
+
+    def getRow(self, signature: str):
+        """Returns the guruData row a signature is saved in, or None if it is not registered."""
+        return self.sigToRow.get(normalizeSignature(signature))
+
+    def peekFreeRow(self):
+        """Returns the first "###" row that a new registration would be written to, or None if the registry is full."""
+        return self.freeRows[0] if self.freeRows else None
+
+    def register(self, signature: str, guruID, row: int):
+        """Records a successful registration of a signature to a Discord ID in the given row."""
+        signature = normalizeSignature(signature)
+        guruID = str(guruID)
+        self.unregister(signature)
+        if (row in self.freeRows):
+            self.freeRows.remove(row)
+            heapq.heapify(self.freeRows)
+        self.sigToID[signature] = guruID
+        self.idToSigs.setdefault(guruID, []).append(signature)
+        self.sigToRow[signature] = row
+
+    def unregister(self, signature: str):
+        """Records a successful removal of a signature's registration, freeing its row."""
+        signature = normalizeSignature(signature)
+        guruID = self.sigToID.pop(signature, None)
+        if (guruID is None): return
+        signatures = self.idToSigs.get(guruID, [])
+        if (signature in signatures): signatures.remove(signature)
+        if (not signatures): self.idToSigs.pop(guruID, None)
+        row = self.sigToRow.pop(signature, None)
+        if (row is not None): heapq.heappush(self.freeRows, row)
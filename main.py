@@ -1,10 +1,13 @@
 import os
+import json
 from dotenv import load_dotenv
 load_dotenv()
 
+import time
 import typing
-
-import pandas as pd
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import discord
 from discord.ext import commands
@@ -12,173 +15,335 @@ from discord import app_commands
 
 from parsefuncts import *
 from strings import *
+from tenants import Tenant, tenantConfigs
+from matchtable import ALL_PODS
+from pagination import sendPages
+from gururegistry import *
+from sheetio import SheetScheduler, QuotaExhausted
+from snapshotdb import SnapshotDB
+from autocomplete import compactKey
+from changelog import ChangeLog, parseSince, formatChangePages
+from metrics import metrics, metricsScope
+
+class InstrumentedTree(app_commands.CommandTree):
+    async def interaction_check(self, interaction: discord.Interaction):
+        interaction.extras["startedAt"] = time.perf_counter()
+        metricsScope.set(interaction.guild_id)
+        metrics.observe("discord.delivery", (discord.utils.utcnow() - interaction.created_at).total_seconds())
+        tenant = tenants.get(interaction.guild_id)
+        if (interaction.type is discord.InteractionType.application_command and tenant is not None and not tenant.isWarm()):
+            if (interaction.command is None or interaction.command.name != "help"):
+                metrics.count("discord.warmingUp")
+                await interaction.response.send_message(WARMINGUPTEXT, ephemeral=True)
+                return False
+        return True
 
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+def observeCommand(interaction: discord.Interaction, outcome: str):
+    """Times a finished command from when its interaction passed InstrumentedTree.interaction_check."""
+    name = interaction.command.qualified_name if interaction.command else "unknown"
+    startedAt = interaction.extras.get("startedAt")
+    if (startedAt is not None): metrics.observe(f"command.{name}", time.perf_counter() - startedAt)
+    if (outcome != "ok"): metrics.count(f"command.{name}.{outcome}")
 
 class Client(commands.Bot):
+    async def setup_hook(self):
+        for tenant in tenants.values():
+            self.loop.create_task(tenant.warmUp())
+            if (tenant.digestChannelID is not None):
+                self.loop.create_task(postDigests(tenant, float(os.getenv('DIGEST_INTERVAL_SECONDS', 3600))))
+        if (os.getenv('METRICS_PATH')):
+            self.loop.create_task(metrics.dumpEvery(os.getenv('METRICS_PATH'), float(os.getenv('METRICS_DUMP_SECONDS', 60))))
+
+    async def on_app_command_completion(self, interaction: discord.Interaction, command):
+        observeCommand(interaction, "ok")
+
     async def on_ready(self):
         print(f'Logged on as {client.user}!')
+        for guild in GUILDS:
+            try:
+                synced = await self.tree.sync(guild=guild)
+                print(f"Synced {len(synced)} command(s) to guild {guild.id}")
+            except Exception as e:
+                print(e)
+
+async def postDigests(tenant: Tenant, interval: float):
+    """Posts the changes since the last digest to a tenant's digest channel every interval seconds, grouped by pod. Quiet intervals are skipped."""
+    metricsScope.set(tenant.guildID)
+    await client.wait_until_ready()
+    lastPost = time.time()
+    while True:
+        await asyncio.sleep(interval)
+        now = time.time()
+        changeList = tenant.store.changes.since(lastPost)
         try:
-            guild = discord.Object(id=os.getenv('GUILD_ID'))
-            synced = await self.tree.sync(guild=guild)
-            print(f"Synced {len(synced)} command(s)")
-        except Exception as e:
-            print(e)
+            if (len(changeList) > 0):
+                channel = client.get_channel(tenant.digestChannelID) or await client.fetch_channel(tenant.digestChannelID)
+                for page in formatChangePages(f"**{len(changeList)} changes since <t:{int(lastPost)}:t>**", changeList):
+                    await channel.send(page, allowed_mentions=discord.AllowedMentions.none())
+            lastPost = now
+        except discord.HTTPException as e:
+            print(f"Could not post change digest: {e}")
 
 intents = discord.Intents.default()
 intents.message_content = True
-client = Client(command_prefix="!", intents=intents)
+client = Client(command_prefix="!", intents=intents, tree_cls=InstrumentedTree)
 
 scope = ['https://spreadsheets.google.com/feeds','https://www.googleapis.com/auth/drive']
-creds = ServiceAccountCredentials.from_json_keyfile_dict(eval(os.getenv('GOOGLE_API_JSON')), scope)
-gc = gspread.authorize(creds)
-sh = gc.open_by_key(os.getenv('SHEET_KEY'))
-matchSheet = sh.worksheet("data")
-guruSheet = sh.worksheet("guruData")
+SHEETS_MAX_WORKERS = int(os.getenv('SHEETS_MAX_WORKERS', 4))
+googleClient = None
+googleClientLock = threading.Lock()
+spreadsheets = {}
+spreadsheetLocks = {}
+def authorizedClient():
+    """
+    Authorizes with Google the first time it is called, and returns the same gspread Client after that.
+    Every tenant's Sheets calls go through this one client's session, whose connection pool is sized to the sheet thread pool.
+    Blocks, so it runs on the sheet thread pool. Threads that call it during the first authorization wait for it instead of authorizing again.
+    gspread and oauth2client are imported here so loading them does not hold up logging in to Discord.
+    """
+    global googleClient
+    with googleClientLock:
+        if (googleClient is None):
+            import gspread
+            from requests.adapters import HTTPAdapter
+            from oauth2client.service_account import ServiceAccountCredentials
+            creds = ServiceAccountCredentials.from_json_keyfile_dict(json.loads(os.getenv('GOOGLE_API_JSON')), scope)
+            googleClient = gspread.authorize(creds)
+            googleClient.http_client.session.mount("https://", HTTPAdapter(pool_maxsize=SHEETS_MAX_WORKERS))
+    return googleClient
+
+def openSpreadsheet(sheetKey: str):
+    """Opens a spreadsheet through the shared authorized client the first time it is asked for, and returns the same Spreadsheet after that."""
+    with googleClientLock:
+        keyLock = spreadsheetLocks.setdefault(sheetKey, threading.Lock())
+    with keyLock:
+        if (sheetKey not in spreadsheets): spreadsheets[sheetKey] = authorizedClient().open_by_key(sheetKey)
+    return spreadsheets[sheetKey]
+
+sheetExecutor = ThreadPoolExecutor(max_workers=SHEETS_MAX_WORKERS, thread_name_prefix="sheets")
+configs = tenantConfigs(os.environ)
+tenants = {}
+for config in configs:
+    requestsPerMinute = config["requestsPerMinute"] or float(os.getenv('SHEETS_REQUESTS_PER_MINUTE', 60)) / len(configs)
+    tenants[config["guild"]] = Tenant(
+        config["guild"], config["sheet"], config["threads"], openSpreadsheet, sheetExecutor, SheetScheduler(requestsPerMinute=requestsPerMinute),
+        hubKey=config["hub"],
+        digestChannelID=config["digestChannel"],
+        refreshInterval=float(os.getenv('SNAPSHOT_REFRESH_SECONDS', 60)),
+        ttl=float(os.getenv('SNAPSHOT_TTL_SECONDS', 300)),
+        writeWindow=float(os.getenv('WRITE_WINDOW_SECONDS', 0.5)),
+        snapshotDB=SnapshotDB(config["snapshotPath"]),
+        staleTimeout=float(os.getenv('SNAPSHOT_STALE_TIMEOUT_SECONDS', 2)),
+        changeLog=ChangeLog(int(os.getenv('CHANGE_LOG_SIZE', 2000)))
+    )
 THREAD_COLUMN = 22
 
-GUILD_ID = discord.Object(id=os.getenv('GUILD_ID'))
-MATCH_THREADS_ID = discord.Object(id=os.getenv('MATCH_THREADS_ID'))
+GUILDS = [discord.Object(id=guildID) for guildID in tenants]
+
+def tenantOf(interaction: discord.Interaction):
+    """Returns the Tenant of the server an interaction came from."""
+    return tenants[interaction.guild_id]
+
+@client.tree.error
+async def onCommandError(interaction: discord.Interaction, error: app_commands.AppCommandError):
+    observeCommand(interaction, "quotaExhausted" if isinstance(getattr(error, "original", None), QuotaExhausted) else "error")
+    if (not isinstance(getattr(error, "original", None), QuotaExhausted)):
+        await app_commands.CommandTree.on_error(client.tree, interaction, error)
+        return
+    message = "Google Sheets is busy right now, please try again in a minute"
+    if (interaction.response.is_done()): await interaction.followup.send(message, ephemeral=True)
+    else: await interaction.response.send_message(message, ephemeral=True)
+
+def prefixChoices(interaction: discord.Interaction, prefixes: str, current: str, normalize):
+    """Suggests up to 25 choices from a PrefixIndex of the current snapshot of the interaction's tenant, without waiting on Google."""
+    matches = tenantOf(interaction).store.peekMatches()
+    metrics.hit("autocomplete.snapshot", matches is not None)
+    if (matches is None): return []
+    with metrics.timed(f"autocomplete.{prefixes}"):
+        return [app_commands.Choice(name=name, value=value) for name, value in getattr(matches, prefixes).search(normalize(current))]
 
-@client.tree.command(name="getmatch", description="Get info about a specific matchup", guild=GUILD_ID)
+async def matchIdAutocomplete(interaction: discord.Interaction, current: str):
+    return prefixChoices(interaction, "matchPrefixes", current, compactKey)
+
+async def podIdAutocomplete(interaction: discord.Interaction, current: str):
+    return prefixChoices(interaction, "podPrefixes", current, compactKey)
+
+async def guruAutocomplete(interaction: discord.Interaction, current: str):
+    return prefixChoices(interaction, "guruPrefixes", current, normalizeSignature)
+
+@client.tree.command(name="getmatch", description="Get info about a specific matchup", guilds=GUILDS)
 @app_commands.describe(
-    matchid='Match ID for the match',
+    matchid='Match ID for the match, or several separated by commas, such as N II 100-115',
     usediscordids='Attempt to use Discord IDs instead of Signatures'
     )
+@app_commands.autocomplete(matchid=matchIdAutocomplete)
 async def getMatch(interaction: discord.Interaction, matchid: str, usediscordids: typing.Literal['Signatures','Discord IDs']='Signatures'):
     await getMatchHelper(interaction, matchid, False, usediscordids=='Discord IDs')
 
-@client.tree.command(name="peekmatch", description="Privately get info about a specific matchup", guild=GUILD_ID)
+@client.tree.command(name="peekmatch", description="Privately get info about a specific matchup", guilds=GUILDS)
 @app_commands.describe(
-    matchid='Match ID for the match',
+    matchid='Match ID for the match, or several separated by commas, such as N II 100-115',
     usediscordids='Attempt to use Discord IDs instead of Signatures'
     )
+@app_commands.autocomplete(matchid=matchIdAutocomplete)
 async def getMatch(interaction: discord.Interaction, matchid: str, usediscordids: typing.Literal['Signatures','Discord IDs']='Signatures'):
     await getMatchHelper(interaction, matchid, True, usediscordids=='Discord IDs')
 
 async def getMatchHelper(interaction: discord.Interaction, matchid: str, publishResults:bool, usediscordids:bool):    
-    podLetter, podNumber, matchNumber, fullName = parseMatchID(matchid)
-    if (fullName == -1):
+    store = tenantOf(interaction).store
+    matchIDs = parseMatchIDs(matchid)
+    if (matchIDs == -1):
         await interaction.response.send_message(f"Unable to parse `{matchid}` as match ID", ephemeral=True)
         return
     await interaction.response.defer(ephemeral=publishResults)
-    matchData = getMatchData(podLetter, podNumber, matchNumber, pd.DataFrame(matchSheet.get_all_records()))
+    matches = await store.getMatches()
+    if (len(matchIDs) > 1):
+        if (usediscordids): gurus = await store.getGurus()
+        else: gurus = None
+        pages = formatMatchPages(matchIDs, matches.table, lambda matchData: formatMatch(matchData, usediscordids, gurus))
+        await sendPages(interaction, pages, ephemeral=publishResults)
+        return
+    podLetter, podNumber, matchNumber, fullName = matchIDs[0]
+    matchData = getMatchData(podLetter, podNumber, matchNumber, matches.table)
     if (matchData.get("matchExists")):
-        if (usediscordids): guruSheet_df = pd.DataFrame(guruSheet.get_all_records())
-        else: guruSheet_df = None
-        matchSummary = f"{fullName}\n{formatMatch(matchData, usediscordids, guruSheet_df)}"
+        if (usediscordids): gurus = await store.getGurus()
+        else: gurus = None
+        matchSummary = f"{fullName}\n{formatMatch(matchData, usediscordids, gurus)}"
         await interaction.followup.send(matchSummary)
         return
     await interaction.followup.send(f"Could not find {fullName}")
 
-@client.tree.command(name="summary", description="Give a summary of matches remaining in a pod", guild=GUILD_ID)
+@client.tree.command(name="summary", description="Give a summary of matches remaining in a pod", guilds=GUILDS)
 @app_commands.describe(
     podid='Pod ID for the pod that will be summarized',
     privacystatus='Force the status of the response',
     onlydiscrepancies='Force only discrepancies or all unfinished matches',
 )
+@app_commands.autocomplete(podid=podIdAutocomplete)
 async def summary(interaction: discord.Interaction, podid: str, onlydiscrepancies:typing.Literal['Only Discrepancies','Everything']='Everything', privacystatus:typing.Literal['Private','Public']='Public'):
+    store = tenantOf(interaction).store
     podLetter, podNumber, fullName = parsePodID(podid)
     if (fullName == -1):
         await interaction.response.send_message(f"Unable to parse `{podid}` as pod ID", ephemeral=True)
         return
     await interaction.response.defer(ephemeral=(privacystatus=='Private'))
-    df = pd.DataFrame(matchSheet.get_all_records())
+    matches = await store.getMatches()
     if (podLetter == "E"):
         podCode = podLetter
     else:
         podCode = podLetter+' '+podNumber
-    incdes_df = df[(df['PID'] == podCode) & (df['InDs'] == 1)]
-    inc_df = incdes_df[incdes_df['Inc'] == 1]
-    totalInc = len(inc_df)
-    des_df = incdes_df[incdes_df['Des'] == 1]
-    totalDes = len(des_df)
-    if(totalInc + totalDes == 0):
+    rollup = matches.getRollup(podCode)
+    if(rollup.totalInc + rollup.totalDes == 0):
         await interaction.followup.send(f"**{fullName}**: {EMOJI_COMPLEAT}")
         return
-    totalR = inc_df['RGu'].sum()
-    totalU = inc_df['UGu'].sum()
-    totalG = inc_df['GGu'].sum()
-    headerString = f"**{fullName}**: {totalInc + totalDes} total matches remaining | {totalDes} discrepancies | {totalInc} incompletes ({EMOJI_R} {totalR} | {EMOJI_U} {totalU} | {EMOJI_G} {totalG})"
-    await interaction.followup.send(formatSummary(headerString, inc_df, des_df,False,onlydiscrepancies=='Only Discrepancies',"Incompletes"))
+    headerString = f"**{fullName}**: {rollup.totalInc + rollup.totalDes} total matches remaining | {rollup.totalDes} discrepancies | {rollup.totalInc} incompletes ({EMOJI_R} {rollup.totalR} | {EMOJI_U} {rollup.totalU} | {EMOJI_G} {rollup.totalG})"
+    pages = matches.rendered(("summary", headerString, onlydiscrepancies), lambda: formatSummaryPages(headerString, rollup.inc_df, rollup.des_df,False,onlydiscrepancies=='Only Discrepancies',"Incompletes"))
+    await sendPages(interaction, pages)
 
-@client.tree.command(name="gurusummary", description="Give a summary of matches remaining for a guru", guild=GUILD_ID)
+@client.tree.command(name="gurusummary", description="Give a summary of matches remaining for a guru", guilds=GUILDS)
 @app_commands.describe(
     guru='Guru signature of the guru to summarize',
     podid='Pod ID for the pod that will be summarized, if you want to restrict',
     privacystatus='Force the status of the response',
     onlydiscrepancies='Force only discrepancies or all unfinished matches',
 )
+@app_commands.autocomplete(guru=guruAutocomplete, podid=podIdAutocomplete)
 async def guruSummary(interaction: discord.Interaction, guru: str, podid:str=None, onlydiscrepancies:typing.Literal['Only Discrepancies','Everything']='Everything', privacystatus:typing.Literal['Private','Public']='Private'):
+    store = tenantOf(interaction).store
     if(podid):
         podLetter, podNumber, fullName = parsePodID(podid)
         if (fullName == -1):
             await interaction.response.send_message(f"Unable to parse `{podid}` as pod ID", ephemeral=True)
             return 
     await interaction.response.defer(ephemeral=(privacystatus=='Private'))
-    guruStripped = guru.strip().casefold()
-    df = pd.DataFrame(matchSheet.get_all_records())
+    matches = await store.getMatches()
     if(podid): 
         if (podLetter == "E"):
             podCode = podLetter
         else:
             podCode = podLetter+' '+podNumber
-        df = df[df['PID'] == podCode]
         inPod = f" in {podCode}"
-    else: inPod = ""
-    incdes_df = df[(df['InDs'] == 1) & ( ( df.RGuru.str.strip().str.casefold() == guruStripped ) | ( df.UGuru.str.strip().str.casefold() == guruStripped ) | ( df.GGuru.str.strip().str.casefold() == guruStripped ) )]
-    inc_df = incdes_df[incdes_df['Inc'] == 1]
-    totalInc = len(inc_df)
-    unf_df = inc_df[((inc_df['RRs'] == "") & (inc_df.RGuru.str.strip().str.casefold() == guruStripped)) | ((inc_df['URs'] == "") & (inc_df.UGuru.str.strip().str.casefold() == guruStripped)) | ((inc_df['GRs'] == "") & (inc_df.GGuru.str.strip().str.casefold() == guruStripped))]
-    totalUnf = len(unf_df)
-    des_df = incdes_df[incdes_df['Des'] == 1]
-    totalDes = len(des_df)
-    if(totalInc + totalDes == 0):
+    else:
+        podCode = None
+        inPod = ""
+    workload = matches.getGuruWorkload(guru, podCode)
+    if(workload.totalInc + workload.totalDes == 0):
         await interaction.followup.send(f"{guru} is {EMOJI_COMPLEAT}{inPod}")
         return
-    headerString = f"{totalInc + totalDes} matches remaining for {guru}{inPod} | {totalDes} discrepancies | {totalUnf} unfilled | {totalInc-totalUnf} incompletes by other gurus"
-    await interaction.followup.send(formatSummary(headerString, unf_df, des_df,True,onlydiscrepancies=='Only Descrepancies',"Unfilled Matches"), ephemeral=True)
+    headerString = f"{workload.totalInc + workload.totalDes} matches remaining for {guru}{inPod} | {workload.totalDes} discrepancies | {workload.totalUnf} unfilled | {workload.totalInc-workload.totalUnf} incompletes by other gurus"
+    pages = matches.rendered(("gurusummary", headerString, podCode, onlydiscrepancies), lambda: formatSummaryPages(headerString, workload.unf_df, workload.des_df,True,onlydiscrepancies=='Only Descrepancies',"Unfilled Matches"))
+    await sendPages(interaction, pages, ephemeral=True)
 
-@client.tree.command(name="summaryall", description="Give a summary of matches remaining in all pods", guild=GUILD_ID)
+@client.tree.command(name="summaryall", description="Give a summary of matches remaining in all pods", guilds=GUILDS)
 @app_commands.describe(
     privacystatus='Force the status of the response',
     onlydiscrepancies='Force only discrepancies or all unfinished matches',
 )
 async def summaryAll(interaction: discord.Interaction, onlydiscrepancies:typing.Literal['Only Descrepancies','Everything']='Everything', privacystatus:typing.Literal['Private','Public']='Public'):
+    store = tenantOf(interaction).store
     await interaction.response.defer(ephemeral=(privacystatus=='Private'))
-    df = pd.DataFrame(matchSheet.get_all_records())
-    incdes_df = df[df['InDs'] == 1]
-    inc_df = incdes_df[incdes_df['Inc'] == 1]
-    totalInc = len(inc_df)
-    des_df = incdes_df[incdes_df['Des'] == 1]
-    totalDes = len(des_df)
-    if(totalInc + totalDes == 0):
+    matches = await store.getMatches()
+    rollup = matches.getRollup(ALL_PODS)
+    if(rollup.totalInc + rollup.totalDes == 0):
         await interaction.followup.send(f"**All Pods**: {EMOJI_COMPLEAT}")
         return
-    headerString = f"**All Pods**: {totalInc + totalDes} matches remaining | {totalDes} discrepancies | {totalInc} incompletes"
-    await interaction.followup.send(formatSummary(headerString, inc_df, des_df,True,onlydiscrepancies=='Only Descrepancies',"Incompletes"))
+    headerString = f"**All Pods**: {rollup.totalInc + rollup.totalDes} matches remaining | {rollup.totalDes} discrepancies | {rollup.totalInc} incompletes"
+    pages = matches.rendered(("summaryall", onlydiscrepancies), lambda: formatSummaryPages(headerString, rollup.inc_df, rollup.des_df,True,onlydiscrepancies=='Only Descrepancies',"Incompletes"))
+    await sendPages(interaction, pages)
+
+@client.tree.command(name="changes", description="List what changed on the sheet recently", guilds=GUILDS)
+@app_commands.describe(
+    since='How far back to look, such as 30m, 2h or 1d, or a Discord timestamp',
+    podid='Pod ID for the pod to list changes in, if you want to restrict',
+    guru='Guru signature to list changes for, if you want to restrict',
+    privacystatus='Force the status of the response',
+)
+@app_commands.autocomplete(podid=podIdAutocomplete, guru=guruAutocomplete)
+async def changes(interaction: discord.Interaction, since: str, podid: str=None, guru: str=None, privacystatus:typing.Literal['Private','Public']='Private'):
+    store = tenantOf(interaction).store
+    sinceTime = parseSince(since)
+    if (sinceTime == -1):
+        await interaction.response.send_message(f"Unable to parse `{since}` as a time", ephemeral=True)
+        return
+    podCode = None
+    if (podid):
+        podLetter, podNumber, fullName = parsePodID(podid)
+        if (fullName == -1):
+            await interaction.response.send_message(f"Unable to parse `{podid}` as pod ID", ephemeral=True)
+            return
+        podCode = podLetter if podLetter == "E" else podLetter+' '+podNumber
+    await interaction.response.defer(ephemeral=(privacystatus=='Private'))
+    changeList = store.changes.since(sinceTime, podCode, guru)
+    scope = (f" in {podCode}" if podCode else "") + (f" for {guru}" if guru else "")
+    if (len(changeList) == 0):
+        await interaction.followup.send(f"No changes{scope} since <t:{int(sinceTime)}:f>")
+        return
+    pages = formatChangePages(f"**{len(changeList)} changes{scope} since <t:{int(sinceTime)}:f>**", changeList)
+    await sendPages(interaction, pages, ephemeral=(privacystatus=='Private'))
 
-@client.tree.command(name="inverseerrors", description="Check all pods for inverse errors", guild=GUILD_ID)
+@client.tree.command(name="inverseerrors", description="Check all pods for inverse errors", guilds=GUILDS)
 @app_commands.describe(
     privacystatus='Force the status of the response',
 )
 async def inverseErrors(interaction: discord.Interaction, privacystatus:typing.Literal['Private','Public']='Public'):
+    store = tenantOf(interaction).store
     await interaction.response.defer(ephemeral=(privacystatus=='Private'))
-    df = pd.DataFrame(matchSheet.get_all_records())
-    error_df = df[df['IVRs'] == 'Error Suspected']
+    matches = await store.getMatches()
+    error_df = matches.frame[matches.inverseErrors]
     total = len(error_df)
     if(total == 0):
         await interaction.followup.send(f"No suspected errors")
         return
     headerString = f"{total} suspected errors"
-    await interaction.followup.send(formatSummary(headerString, error_df, error_df,True,True,""))
+    await sendPages(interaction, matches.rendered(("inverseerrors",), lambda: formatSummaryPages(headerString, error_df, error_df,True,True,"")))
 
-@client.tree.command(name="tlink", description="Link a thread to a match", guild=GUILD_ID)
+@client.tree.command(name="tlink", description="Link a thread to a match", guilds=GUILDS)
 @app_commands.describe(matchid='Match ID for the match to be linked')
+@app_commands.autocomplete(matchid=matchIdAutocomplete)
 async def tLink(interaction: discord.Interaction, matchid: str):
+    store = tenantOf(interaction).store
     try:
-        validThread = (interaction.channel.parent_id == MATCH_THREADS_ID.id)
+        validThread = (interaction.channel.parent_id == tenantOf(interaction).threadsChannelID)
     except:
         validThread = False
     if (not validThread):
@@ -190,21 +355,24 @@ async def tLink(interaction: discord.Interaction, matchid: str):
             await interaction.response.send_message(f"Unable to parse `{matchid}` as match ID", ephemeral=True)
             return
         await interaction.response.defer()
-        matchData = getMatchData(podLetter, podNumber, matchNumber, pd.DataFrame(matchSheet.get_all_records()))
+        matches = await store.getMatches(forWrite=True)
+        matchData = getMatchData(podLetter, podNumber, matchNumber, matches.table)
         if (matchData.get("matchExists")):
             if (not matchData["linkedID"] == "0"):
                 await interaction.followup.send(f"{fullName} already linked to <#{matchData['linkedID']}>")
             else:
-                matchSheet.update_cell(matchData["rowNumber"], THREAD_COLUMN, str(interaction.channel_id))
+                await store.updateMatchCell(matchData["rowNumber"], THREAD_COLUMN, str(interaction.channel_id))
                 await interaction.followup.send(f"Link created from {fullName} to <#{interaction.channel_id}>")
             return
         await interaction.followup.send(f"Could not find {fullName}")
 
-@client.tree.command(name="writeup", description="Combines getmatch, pingmatch, and tlink", guild=GUILD_ID)
+@client.tree.command(name="writeup", description="Combines getmatch, pingmatch, and tlink", guilds=GUILDS)
 @app_commands.describe(matchid='Match ID for the match to be written up')
+@app_commands.autocomplete(matchid=matchIdAutocomplete)
 async def writeup(interaction: discord.Interaction, matchid: str):
+    store = tenantOf(interaction).store
     try:
-        validThread = (interaction.channel.parent_id == MATCH_THREADS_ID.id)
+        validThread = (interaction.channel.parent_id == tenantOf(interaction).threadsChannelID)
     except:
         validThread = False
     if (not validThread):
@@ -216,26 +384,28 @@ async def writeup(interaction: discord.Interaction, matchid: str):
             await interaction.response.send_message(f"Unable to parse `{matchid}` as match ID", ephemeral=True)
             return
         await interaction.response.defer(ephemeral=True)
-        matchData = getMatchData(podLetter, podNumber, matchNumber, pd.DataFrame(matchSheet.get_all_records()))
+        matches = await store.getMatches(forWrite=True)
+        matchData = getMatchData(podLetter, podNumber, matchNumber, matches.table)
         if (matchData.get("matchExists")):
             if (not matchData["linkedID"] == "0"):
                 await interaction.followup.send(f"{fullName} already linked to <#{matchData['linkedID']}>")
             else:
-                matchSheet.update_cell(matchData["rowNumber"], THREAD_COLUMN, str(interaction.channel_id))
+                await store.updateMatchCell(matchData["rowNumber"], THREAD_COLUMN, str(interaction.channel_id))
                 responseString = f"Link created from {fullName} to <#{interaction.channel_id}>"
-                responseString += f"\n{formatMatch(matchData, True, pd.DataFrame(guruSheet.get_all_records()))}"
+                responseString += f"\n{formatMatch(matchData, True, await store.getGurus())}"
                 await interaction.channel.send(responseString)
                 await interaction.delete_original_response()
             return
         await interaction.followup.send(f"Could not find {fullName}")
 
-@client.tree.command(name="checklinked", description="Check all linked matches to a thread", guild=GUILD_ID)
+@client.tree.command(name="checklinked", description="Check all linked matches to a thread", guilds=GUILDS)
 @app_commands.describe(
     privacystatus='Force the status of the response',
 )
 async def checkLinked(interaction: discord.Interaction, privacystatus:typing.Literal['Private','Public']='Public'):
+    store = tenantOf(interaction).store
     try:
-        validThread = (interaction.channel.parent_id == MATCH_THREADS_ID.id)
+        validThread = (interaction.channel.parent_id == tenantOf(interaction).threadsChannelID)
     except:
         validThread = False
     if (not validThread):
@@ -243,54 +413,72 @@ async def checkLinked(interaction: discord.Interaction, privacystatus:typing.Lit
         return
     else:
         await interaction.response.defer(ephemeral=(privacystatus=='Private'))
-        df = pd.DataFrame(matchSheet.get_all_records())
-        thread_df = df[df['TLink'] == interaction.channel.id]
-        if(len(thread_df)>0):
-            await interaction.followup.send(threadSummary(thread_df))
+        matches = await store.getMatches()
+        linkedMatches = matches.table.linkedTo(interaction.channel.id)
+        if(len(linkedMatches)>0):
+            await interaction.followup.send(matches.rendered(("checklinked", interaction.channel.id), lambda: threadSummary(linkedMatches)))
         else:
             await interaction.followup.send("No matches are linked to this thread")       
 
-@client.tree.command(name="ulink", description="Remove all linked threads threads for a match", guild=GUILD_ID)
+@client.tree.command(name="ulink", description="Remove all linked threads threads for a match", guilds=GUILDS)
 @app_commands.describe(matchid='Match ID for the match to be unlinked')
+@app_commands.autocomplete(matchid=matchIdAutocomplete)
 async def ulink(interaction: discord.Interaction, matchid: str):
+    store = tenantOf(interaction).store
     podLetter, podNumber, matchNumber, fullName = parseMatchID(matchid)
     if (fullName == -1):
         await interaction.response.send_message(f"Unable to parse `{matchid}` as match ID", ephemeral=True)
         return
     await interaction.response.defer()
-    matchData = getMatchData(podLetter, podNumber, matchNumber, pd.DataFrame(matchSheet.get_all_records()))
+    matches = await store.getMatches(forWrite=True)
+    matchData = getMatchData(podLetter, podNumber, matchNumber, matches.table)
     if (matchData.get("matchExists")):
         if (matchData["linkedID"] == "0"):
             await interaction.followup.send(f"{fullName} is not linked to any thread", ephemeral=True)
         else:
-            matchSheet.update_cell(matchData["rowNumber"], THREAD_COLUMN, "0")
+            await store.updateMatchCell(matchData["rowNumber"], THREAD_COLUMN, "0")
             await interaction.followup.send(f"Link removed from {fullName} to <#{matchData['linkedID']}>")
         return
     await interaction.followup.send(f"Could not find {fullName}", ephemeral=True)
 
-@client.tree.command(name="pingmatch", description="Ping all gurus for a specific match", guild=GUILD_ID)
-@app_commands.describe(matchid='Match ID for the match to be pinged')
+def pingLines(matchData: dict, gurus: GuruRegistry):
+    pingString = f"> {EMOJI_R} {getGuruString(matchData.get('guruR'),True,gurus)}"
+    pingString += f"\n> {EMOJI_U} {getGuruString(matchData.get('guruU'),True,gurus)}"
+    pingString += f"\n> {EMOJI_G} {getGuruString(matchData.get('guruG'),True,gurus)}"
+    return pingString
+
+@client.tree.command(name="pingmatch", description="Ping all gurus for a specific match", guilds=GUILDS)
+@app_commands.describe(matchid='Match ID for the match to be pinged, or several separated by commas, such as N II 100-115')
+@app_commands.autocomplete(matchid=matchIdAutocomplete)
 async def pingMatch(interaction: discord.Interaction, matchid: str):
-    podLetter, podNumber, matchNumber, fullName = parseMatchID(matchid)
-    if (fullName == -1):
+    store = tenantOf(interaction).store
+    matchIDs = parseMatchIDs(matchid)
+    if (matchIDs == -1):
         await interaction.response.send_message(f"Unable to parse `{matchid}` as match ID", ephemeral=True)
         return
     await interaction.response.defer(ephemeral=True)
-    matchData = getMatchData(podLetter, podNumber, matchNumber, pd.DataFrame(matchSheet.get_all_records()))
+    matches = await store.getMatches()
+    if (len(matchIDs) > 1):
+        gurus = await store.getGurus()
+        pages = formatMatchPages(matchIDs, matches.table, lambda matchData: pingLines(matchData, gurus))
+        for page in pages:
+            await interaction.channel.send(page)
+        await interaction.delete_original_response()
+        return
+    podLetter, podNumber, matchNumber, fullName = matchIDs[0]
+    matchData = getMatchData(podLetter, podNumber, matchNumber, matches.table)
     if (matchData.get("matchExists")):
-        guru_df = pd.DataFrame(guruSheet.get_all_records())
-        pingString = f"{fullName}"
-        pingString += f"\n> {EMOJI_R} {getGuruString(matchData.get('guruR'),True,guru_df)}"
-        pingString += f"\n> {EMOJI_U} {getGuruString(matchData.get('guruU'),True,guru_df)}"
-        pingString += f"\n> {EMOJI_G} {getGuruString(matchData.get('guruG'),True,guru_df)}"
+        gurus = await store.getGurus()
+        pingString = f"{fullName}\n{pingLines(matchData, gurus)}"
         await interaction.channel.send(f"{pingString}")
         await interaction.delete_original_response()
         return
     await interaction.followup.send(f"Could not find {fullName}", ephemeral=True)
 
-@client.tree.command(name="registerguru", description="Connect your discord to your guru signature", guild=GUILD_ID)
+@client.tree.command(name="registerguru", description="Connect your discord to your guru signature", guilds=GUILDS)
 @app_commands.describe(signature='Guru signature to register to your account')
 async def registerGuru(interaction: discord.Interaction, signature: str):
+    store = tenantOf(interaction).store
     await interaction.response.defer()
     savedSignature = signature.strip().casefold()
     if (len(savedSignature)==0):
@@ -299,22 +487,18 @@ async def registerGuru(interaction: discord.Interaction, signature: str):
     if (len(savedSignature)>128):
         await interaction.followup.send(f"Signature is too long", ephemeral=True)
         return
-    cell = guruSheet.find(savedSignature)
-    if (cell):
-        registedID = guruSheet.cell(cell.row, 2).value
+    status, registedID = await store.registerGuru(savedSignature, interaction.user.id)
+    if (status == ALREADY_REGISTERED):
         await interaction.followup.send(f"{signature} has already been registered to <@{registedID}>")
+    elif (status == REGISTERED):
+        await interaction.followup.send(f"Registered  <@{interaction.user.id}> to {signature}")
     else:
-        emptyCell = guruSheet.find("###")
-        if(emptyCell):
-            guruSheet.update_cell(emptyCell.row, 1, savedSignature)
-            guruSheet.update_cell(emptyCell.row, 2, str(interaction.user.id)) 
-            await interaction.followup.send(f"Registered  <@{interaction.user.id}> to {signature}")
-        else:
-            await interaction.followup.send("Guru registry full")
+        await interaction.followup.send("Guru registry full")
 
-@client.tree.command(name="unregisterguru", description="Remove your discord from a guru signature", guild=GUILD_ID)
+@client.tree.command(name="unregisterguru", description="Remove your discord from a guru signature", guilds=GUILDS)
 @app_commands.describe(signature='Guru signature to unregister from your account')
 async def unregisterGuru(interaction: discord.Interaction, signature: str):
+    store = tenantOf(interaction).store
     await interaction.response.defer()
     savedSignature = signature.strip().casefold()
     if (len(savedSignature)==0):
@@ -323,27 +507,55 @@ async def unregisterGuru(interaction: discord.Interaction, signature: str):
     if (len(savedSignature)>128):
         await interaction.followup.send(f"Signature is too long", ephemeral=True)
         return
-    cell = guruSheet.find(savedSignature)
-    if (cell):
-        registedID = guruSheet.cell(cell.row, 2).value
-        if (str(registedID) == str(interaction.user.id)):
-            guruSheet.update_cell(cell.row, 1, '###')
-            guruSheet.update_cell(cell.row, 2, '0')
-            await interaction.followup.send(f"Unregistered  <@{interaction.user.id}> from {signature}")
-        else:
-            await interaction.followup.send(f"You can only unregister your own signatures.")
+    status, registedID = await store.unregisterGuru(savedSignature, interaction.user.id)
+    if (status == UNREGISTERED):
+        await interaction.followup.send(f"Unregistered  <@{interaction.user.id}> from {signature}")
+    elif (status == NOT_OWNER):
+        await interaction.followup.send(f"You can only unregister your own signatures.")
     else:
         await interaction.followup.send(f"{signature} has not been registered")
 
-@client.tree.command(name="discrepancyurl", description="Gives URL to Guru Match Hub", guild=GUILD_ID)
+@client.tree.command(name="mysignatures", description="List the guru signatures registered to your account", guilds=GUILDS)
+async def mySignatures(interaction: discord.Interaction):
+    store = tenantOf(interaction).store
+    await interaction.response.defer(ephemeral=True)
+    signatures = (await store.getGurus()).getSignatures(interaction.user.id)
+    if (len(signatures) == 0):
+        await interaction.followup.send("You have not registered any signatures")
+        return
+    await interaction.followup.send(f"Signatures registered to <@{interaction.user.id}>: " + ", ".join(signatures))
+
+@client.tree.command(name="discrepancyurl", description="Gives URL to Guru Match Hub", guilds=GUILDS)
 async def discrepancyUrl(interaction: discord.Interaction):
-    await interaction.response.send_message(f"https://docs.google.com/spreadsheets/d/"+os.getenv('HUB_KEY')+ f"/edit?usp=sharing", ephemeral=True)
+    hubKey = tenantOf(interaction).hubKey
+    if (hubKey is None):
+        await interaction.response.send_message("This server does not have a guru match hub", ephemeral=True)
+        return
+    await interaction.response.send_message(f"https://docs.google.com/spreadsheets/d/"+hubKey+ f"/edit?usp=sharing", ephemeral=True)
+
+@client.tree.command(name="stats", description="Admin only: latency, Sheets calls and cache hit rates since startup", guilds=GUILDS)
+@app_commands.describe(
+    section='Which metrics to list',
+)
+@app_commands.default_permissions(administrator=True)
+async def stats(interaction: discord.Interaction, section:typing.Literal['Commands','Sheets','Caches','Everything']='Everything'):
+    permissions = getattr(interaction.user, "guild_permissions", None)
+    if (permissions is None or not permissions.administrator):
+        await interaction.response.send_message("stats is only available to server administrators", ephemeral=True)
+        return
+    await interaction.response.defer(ephemeral=True)
+    prefixes = {'Commands': ["command.", "discord."], 'Sheets': ["sheets.", "writes.", "store."], 'Caches': ["snapshot.", "autocomplete.", "store."], 'Everything': [""]}[section]
+    lines = [line for prefix in prefixes for line in metrics.report(prefix, interaction.guild_id)]
+    lines = list(dict.fromkeys(lines)) or ["\nNothing recorded yet"]
+    pages = paginateLines(f"**Stats for this server since <t:{int(metrics.startedAt)}:f>**", [("", lines)])
+    await sendPages(interaction, pages, ephemeral=True)
 
-@client.tree.command(name="help", description="Information about Memknight commands", guild=GUILD_ID)
+@client.tree.command(name="help", description="Information about Memknight commands", guilds=GUILDS)
 @app_commands.describe(
     command='Command to get info about'
     )
-async def getMatch(interaction: discord.Interaction, command:typing.Literal['getmatch', 'peekmatch', 'pingmatch', 'writeup', 'summary', 'summaryall', 'gurusummary', 'tlink', 'ulink', 'registerguru', 'unregisterguru', 'discrepancyurl', 'Match IDs']=None):
+async def getMatch(interaction: discord.Interaction, command:typing.Literal['getmatch', 'peekmatch', 'pingmatch', 'writeup', 'summary', 'summaryall', 'gurusummary', 'tlink', 'ulink', 'registerguru', 'unregisterguru', 'mysignatures', 'changes', 'stats', 'discrepancyurl', 'Match IDs']=None):
     await interaction.response.send_message(HELPTEXT.get(command,DEFAULTHELPTEXT), ephemeral=True)
 
-client.run(os.getenv('TOKEN'))
\ No newline at end of file
+if __name__ == "__main__":
+    client.run(os.getenv('TOKEN'))
\ No newline at end of file
@@ -0,0 +1,455 @@
+import asyncio
+import itertools
+import time
+from functools import cached_property
+
+from matchtable import *
+from gururegistry import *
+from writequeue import WriteQueue
+from sheetio import SingleFlight, QuotaExhausted, sheetPriority, PRIORITY_BACKGROUND
+from matchsync import MatchSync
+from snapshotdb import SnapshotDB
+from autocomplete import *
+from changelog import ChangeLog, diffMatches
+from metrics import metrics
+
+class MatchSnapshot:
+    """
+    One download of the data worksheet, shared read-only by every command until the next refresh.
+
+    Single-match lookups go through table. The rollup, guru and inverse error analytics are built from table.frame with pandas,
+    which is only imported the first time one of them is used.
+
+    Args:
+        rows: A list of the Match of every row of match result data, kept as a MatchTable
+        version: Increasing number identifying this snapshot
+        fetchedAt: When the sheet data in this snapshot was downloaded, defaulting to now
+        changedRows: Row positions that differ from the previous snapshot, or None if every row should be treated as changed
+        fromDisk: Whether the data was loaded from a saved snapshot rather than the sheet
+        previous: The snapshot this one replaces, whose rollups are reused for pods without changed rows and whose table's indexes are patched with the changed rows
+    """
+    def __init__(self, rows: list, version: int, fetchedAt: float=None, changedRows: set=None, fromDisk: bool=False, previous=None):
+        self.table = MatchTable(rows, previous.table if previous is not None else None, changedRows)
+        self.version = version
+        self.fetchedAt = time.monotonic() if fetchedAt is None else fetchedAt
+        self.changedRows = changedRows
+        self.fromDisk = fromDisk
+        self._rendered = {}
+        self._reusableRollups = self._findReusableRollups(previous)
+
+    def _findReusableRollups(self, previous):
+        if (previous is None or self.changedRows is None): return {}
+        if ('rollups' in previous.__dict__): rollups = previous.rollups
+        else: rollups = previous._reusableRollups
+        if (not rollups or len(self.changedRows) == 0): return rollups
+        dirtyPods = {table[row].PID for table in (previous.table, self.table) for row in self.changedRows}
+        return {pod: rollup for pod, rollup in rollups.items() if pod not in dirtyPods and pod != ALL_PODS}
+
+    @property
+    def frame(self):
+        """DataFrame of all match result data, for the bulk analytics. Built from table on first use."""
+        return self.table.frame
+
+    @cached_property
+    def rollups(self):
+        """PodRollups for every pod and ALL_PODS in this snapshot, as built by buildRollups. Built on first use."""
+        from rollups import buildRollups
+        with metrics.timed("snapshot.rollups"):
+            rollups = buildRollups(self.frame, self._reusableRollups)
+        self._reusableRollups = None
+        return rollups
+
+    @cached_property
+    def inverseErrors(self):
+        """Boolean Series of matches inconsistent with their inverse, as returned by findInverseErrors. Built on first use."""
+        from rollups import findInverseErrors
+        with metrics.timed("snapshot.inverseErrors"):
+            return findInverseErrors(self.frame)
+
+    @cached_property
+    def guruIndex(self):
+        """Inverted guru index for this snapshot, as built by buildGuruIndex. Built on first use."""
+        from rollups import buildGuruIndex
+        with metrics.timed("snapshot.guruIndex"):
+            return buildGuruIndex(self.frame)
+
+    @cached_property
+    def matchPrefixes(self):
+        """PrefixIndex of match IDs for autocomplete, as built by buildMatchPrefixIndex. Built on first use."""
+        return buildMatchPrefixIndex(self.table)
+
+    @cached_property
+    def podPrefixes(self):
+        """PrefixIndex of pod IDs for autocomplete, as built by buildPodPrefixIndex. Built on first use."""
+        return buildPodPrefixIndex(self.table)
+
+    @cached_property
+    def guruPrefixes(self):
+        """PrefixIndex of guru signatures for autocomplete, as built by buildGuruPrefixIndex. Built on first use."""
+        return buildGuruPrefixIndex(self.table)
+
+    def getGuruWorkload(self, guru: str, podCode: str=None):
+        """Returns the GuruWorkload of a guru, optionally restricted to one pod code."""
+        from rollups import guruWorkload
+        return guruWorkload(self.frame, self.guruIndex, guru, podCode)
+
+    def rendered(self, key: tuple, render):
+        """
+        Memoizes a rendered message for the life of this snapshot.
+
+        Args:
+            key: A hashable description of the query, identical for identical messages
+            render: A function with no arguments that renders the message, called only the first time key is seen
+
+        Returns:
+            The rendered message.
+        """
+        message = self._rendered.get(key)
+        metrics.hit("snapshot.rendered", message is not None)
+        if (message is None):
+            with metrics.timed("snapshot.render"):
+                message = render()
+            self._rendered[key] = message
+        return message
+
+    def getRollup(self, podCode: str):
+        """Returns the PodRollup of a pod code or ALL_PODS, which is empty if nothing in it remains."""
+        from rollups import emptyRollup
+        rollup = self.rollups.get(podCode)
+        return rollup if rollup is not None else emptyRollup(self.frame)
+
+class PendingWrite:
+    """
+    A write the bot has queued, applied on top of every download until one that started after the write went through.
+
+    Args:
+        value: What was written
+    """
+    def __init__(self, value):
+        self.value = value
+        self.confirmedAt = None
+
+def forgetConfirmed(pending: dict, startedAt: int):
+    """Drops the PendingWrites that went through before a download numbered startedAt began, since it already shows them."""
+    for key in [key for key, write in pending.items() if write.confirmedAt is not None and write.confirmedAt < startedAt]:
+        del pending[key]
+
+class MatchStore:
+    """
+    Process-wide cache of the data and guruData worksheets.
+
+    Commands read the latest snapshot from memory. A match snapshot is synced again when it is older than ttl seconds,
+    when it has been invalidated, or by the background refresh loop every refreshInterval seconds.
+    Syncs go through MatchSync, so only the columns the bot uses are downloaded and only changed rows are parsed.
+    The guru registry is downloaded once, kept current by the bot's own registrations, and reloaded by the background refresh loop.
+
+    The bot's own writes are applied to memory immediately and sent through one WriteQueue per worksheet,
+    so follow-up reads see them before Google does. Writes to either worksheet are applied again on top of every download until one that started after the write went through.
+    If a write fails, the affected sheet is downloaded again.
+    Every new match snapshot is compared with the one it replaces and the differences are recorded in a ChangeLog.
+
+    If a SnapshotDB is given, the last good snapshots are saved to it by the background refresh loop and loaded from it by start.
+    Snapshots loaded from disk are served straight away while the first refresh runs. An expired snapshot is served if a refresh
+    has not finished within staleTimeout seconds or fails, so reads keep working while Google is slow.
+    Writes wait for data from the sheet, unless the Sheets quota is exhausted and a snapshot downloaded earlier is in memory.
+    The background refresh loop reads at PRIORITY_BACKGROUND, so commands get quota first.
+
+    Args:
+        matchSheet: The data worksheet, wrapped in an AsyncWorksheet
+        guruSheet: The guruData worksheet, wrapped in an AsyncWorksheet
+        refreshInterval: Seconds between background refreshes
+        ttl: Seconds a snapshot may be served before a command forces a refresh
+        writeWindow: Seconds each WriteQueue waits to gather updates before flushing
+        snapshotDB: Where to save and load snapshots, if anywhere
+        staleTimeout: Seconds a read waits for a refresh before serving an expired snapshot
+        changeLog: Where the changes between consecutive match snapshots are recorded, defaulting to a new ChangeLog
+    """
+    def __init__(self, matchSheet, guruSheet, refreshInterval: float=60, ttl: float=300, writeWindow: float=0.5, snapshotDB: SnapshotDB=None, staleTimeout: float=2, changeLog: ChangeLog=None):
+        self.matchSheet = matchSheet
+        self.guruSheet = guruSheet
+        self.matchSync = MatchSync(matchSheet)
+        self.matchWrites = WriteQueue(matchSheet, writeWindow)
+        self.guruWrites = WriteQueue(guruSheet, writeWindow)
+        self.refreshInterval = refreshInterval
+        self.ttl = ttl
+        self.snapshotDB = snapshotDB
+        self.staleTimeout = staleTimeout
+        self._matches = None
+        self._invalidatedMatches = None
+        self._pendingMatchCells = {}
+        self._pendingGuruRows = {}
+        self._sequence = itertools.count(1)
+        self._gurus = GuruRegistry()
+        self._version = 0
+        self._refreshes = SingleFlight("store.sharedRefreshes")
+        self._refreshTask = None
+        self._savedVersions = {}
+        self.changes = changeLog if changeLog is not None else ChangeLog()
+
+    def _isFresh(self, snapshot):
+        return snapshot is not None and time.monotonic() - snapshot.fetchedAt < self.ttl
+
+    def _nextVersion(self):
+        self._version += 1
+        return self._version
+
+    async def refreshMatches(self):
+        """Downloads the data worksheet and replaces the current match snapshot. Concurrent calls share one download."""
+        return await self._refreshes.do("matches", self._downloadMatches)
+
+    async def _downloadMatches(self):
+        startedAt = next(self._sequence)
+        with metrics.timed("store.syncMatches"):
+            rows, changedRows = await self.matchSync.sync()
+        forgetConfirmed(self._pendingMatchCells, startedAt)
+        rows = self._applyCells(rows, {cell: write.value for cell, write in self._pendingMatchCells.items()})
+        if (changedRows is not None):
+            changedRows = changedRows | {row - 2 for row, col in self._pendingMatchCells}
+        self._setMatches(MatchSnapshot(rows, self._nextVersion(), changedRows=changedRows, previous=self._matches))
+        return self._matches
+
+    def _setMatches(self, snapshot: MatchSnapshot, record: bool=True):
+        previous, changedRows = self._matches, snapshot.changedRows
+        if (previous is None): previous, changedRows = self._invalidatedMatches, None
+        self._matches = snapshot
+        self._invalidatedMatches = None
+        if (previous is not None and record): self._recordChanges(previous, snapshot, changedRows)
+
+    def _recordChanges(self, before: MatchSnapshot, after: MatchSnapshot, changedRows: set=None):
+        try:
+            self.changes.record(diffMatches(before.table, after.table, changedRows))
+        except Exception as e:
+            print(f"Could not record match changes: {e}")
+
+    def _applyCells(self, rows: list, cells: dict):
+        changes = {}
+        for (row, col), value in cells.items():
+            name = self.matchSync.columnName(col)
+            if (name is None): continue
+            changes.setdefault(name, {})[row - 2] = str(value)
+        if (not changes): return rows
+        return replaceCells(rows, changes)
+
+    async def refreshGurus(self):
+        """Downloads the guruData worksheet and reloads the guru registry in place. Concurrent calls share one download."""
+        return await self._refreshes.do("gurus", self._downloadGurus)
+
+    async def _downloadGurus(self):
+        async with self._gurus.writeLock:
+            startedAt = next(self._sequence)
+            with metrics.timed("store.downloadGurus"):
+                records = await self.guruSheet.get_all_records()
+            forgetConfirmed(self._pendingGuruRows, startedAt)
+            self._gurus.load(self._applyGuruRows(records, self._pendingGuruRows), self._nextVersion())
+        return self._gurus
+
+    def _applyGuruRows(self, records: list, guruRows: dict):
+        if (not guruRows): return records
+        records = list(records)
+        for row, write in guruRows.items():
+            signature, guruID = write.value
+            while (len(records) < row - 1): records.append({'NAME': "", 'GURUID': ""})
+            records[row - 2] = {**records[row - 2], 'NAME': signature, 'GURUID': guruID}
+        return records
+
+    async def getMatches(self, forWrite: bool=False):
+        """
+        Returns the latest match snapshot, downloading it first if there is none or it has expired.
+
+        Args:
+            forWrite: If true, never serve an expired or saved snapshot, since the caller is about to write based on it,
+                unless the Sheets quota is exhausted and the expired snapshot came from the sheet
+        """
+        snapshot = self._matches
+        metrics.hit("store.matches", self._isFresh(snapshot))
+        if (self._isFresh(snapshot)): return snapshot
+        if (snapshot is None or forWrite): return await self._refreshOrFallBack(snapshot)
+        return await self._refreshOrServe(self.refreshMatches(), snapshot)
+
+    def peekMatches(self):
+        """Returns the latest match snapshot as it is, or None if there is none yet. Never downloads, so it is safe for autocomplete."""
+        return self._matches
+
+    async def getGurus(self, forWrite: bool=False):
+        """
+        Returns the guru registry, downloading it first if it has not been loaded yet.
+
+        Args:
+            forWrite: If true, never serve a registry loaded from disk, since the caller is about to write based on it
+        """
+        needsRefresh = not self._gurus.isLoaded() or (forWrite and self._gurus.fromDisk)
+        metrics.hit("store.gurus", not needsRefresh)
+        if (needsRefresh): return await self.refreshGurus()
+        return self._gurus
+
+    async def _refreshOrFallBack(self, snapshot):
+        try:
+            return await self.refreshMatches()
+        except QuotaExhausted:
+            if (snapshot is None or snapshot.fromDisk): raise
+            print("Sheets quota exhausted, writing against the last downloaded snapshot")
+            metrics.count("store.matches.servedStale")
+            return snapshot
+
+    async def _refreshOrServe(self, refresh, snapshot):
+        refresh = asyncio.ensure_future(refresh)
+        refresh.add_done_callback(self._logRefreshFailure)
+        timeout = 0 if snapshot.fromDisk else self.staleTimeout
+        try:
+            return await asyncio.wait_for(asyncio.shield(refresh), timeout)
+        except Exception:
+            metrics.count("store.matches.servedStale")
+            return snapshot
+
+    def _logRefreshFailure(self, refresh):
+        if (not refresh.cancelled() and refresh.exception() is not None):
+            print(f"Snapshot refresh failed: {refresh.exception()}")
+
+    def invalidateMatches(self):
+        """Forces the next read of the match snapshot to download the data worksheet again."""
+        if (self._matches is not None): self._invalidatedMatches = self._matches
+        self._matches = None
+
+    async def updateMatchCell(self, row: int, col: int, value):
+        """
+        Writes one cell of the data worksheet, applying it to the current match snapshot first.
+        The change is only recorded in the ChangeLog once the write has gone through.
+        If it fails, the cell is put back in the snapshot the next download is compared with, so the log never shows it undone.
+
+        Args:
+            row: The sheet row, as in the rowNumber returned by getMatchData
+            col: The sheet column, starting from 1
+            value: The value to write
+        """
+        snapshot = await self.getMatches(forWrite=True)
+        rows = self._applyCells(snapshot.table.rows, {(row, col): value})
+        written = MatchSnapshot(rows, self._nextVersion(), snapshot.fetchedAt, {row - 2}, previous=snapshot)
+        self._setMatches(written, record=False)
+        pending = PendingWrite(value)
+        self._pendingMatchCells[(row, col)] = pending
+        try:
+            await self.matchWrites.updateCell(row, col, value)
+        except Exception:
+            if (self._pendingMatchCells.get((row, col)) is pending): del self._pendingMatchCells[(row, col)]
+            self.invalidateMatches()
+            self._revertCell(row, col, snapshot)
+            raise
+        pending.confirmedAt = next(self._sequence)
+        self._recordChanges(snapshot, written, {row - 2})
+
+    def _revertCell(self, row: int, col: int, before: MatchSnapshot):
+        invalidated = self._invalidatedMatches
+        name = self.matchSync.columnName(col)
+        if (invalidated is None or name is None or len(invalidated.table) != len(before.table)): return
+        rows = self._applyCells(invalidated.table.rows, {(row, col): getattr(before.table[row - 2], name)})
+        self._invalidatedMatches = MatchSnapshot(rows, invalidated.version, invalidated.fetchedAt, {row - 2}, previous=invalidated)
+
+    async def _writeGuruRow(self, row: int, signature: str, guruID):
+        pending = PendingWrite((signature, str(guruID)))
+        self._pendingGuruRows[row] = pending
+        try:
+            await self.guruWrites.updateRange(f"A{row}:B{row}", [list(pending.value)])
+        except Exception:
+            if (self._pendingGuruRows.get(row) is pending): del self._pendingGuruRows[row]
+            self._gurus.fetchedAt = None
+            raise
+        pending.confirmedAt = next(self._sequence)
+
+    async def registerGuru(self, signature: str, guruID):
+        """
+        Registers a signature to a Discord ID in the first free row of the guruData worksheet.
+
+        Args:
+            signature: The signature to register, already normalized
+            guruID: The Discord ID to register it to
+
+        Returns:
+            Returns a 2-tuple
+                status: REGISTERED, ALREADY_REGISTERED, or REGISTRY_FULL
+                registeredID: The Discord ID the signature is registered to afterwards, or None if the registry is full
+        """
+        gurus = await self.getGurus(forWrite=True)
+        async with gurus.writeLock:
+            registeredID = gurus.getID(signature)
+            if (registeredID is not None): return ALREADY_REGISTERED, registeredID
+            row = gurus.peekFreeRow()
+            if (row is None): return REGISTRY_FULL, None
+            gurus.register(signature, guruID, row)
+        await self._writeGuruRow(row, signature, guruID)
+        return REGISTERED, str(guruID)
+
+    async def unregisterGuru(self, signature: str, guruID):
+        """
+        Frees a signature's row in the guruData worksheet if it is registered to the given Discord ID.
+
+        Args:
+            signature: The signature to unregister, already normalized
+            guruID: The Discord ID asking to unregister it
+
+        Returns:
+            Returns a 2-tuple
+                status: UNREGISTERED, NOT_REGISTERED, or NOT_OWNER
+                registeredID: The Discord ID the signature was registered to, or None if it was not registered
+        """
+        gurus = await self.getGurus(forWrite=True)
+        async with gurus.writeLock:
+            registeredID = gurus.getID(signature)
+            if (registeredID is None): return NOT_REGISTERED, None
+            if (registeredID != str(guruID)): return NOT_OWNER, registeredID
+            row = gurus.getRow(signature)
+            gurus.unregister(signature)
+        await self._writeGuruRow(row, EMPTY_SIGNATURE, EMPTY_GURUID)
+        return UNREGISTERED, registeredID
+
+    def loadFromDisk(self):
+        """
+        Loads the saved match and guru snapshots, if there are any. Blocks on the SnapshotDB.
+        """
+        if (self.snapshotDB is None): return
+        saved = self.snapshotDB.load("data")
+        if (saved is not None and self._matches is None):
+            rows = self.matchSync.restoreState(saved["state"])
+            self._version = max(self._version, saved["version"])
+            self._matches = MatchSnapshot(rows, self._version, float("-inf"), fromDisk=True)
+            print(f"Loaded {len(rows)} saved matches")
+        saved = self.snapshotDB.load("guruData")
+        if (saved is not None and not self._gurus.isLoaded()):
+            self._version = max(self._version, saved["version"])
+            self._gurus.load(saved["records"], self._version, fromDisk=True)
+
+    async def saveToDisk(self):
+        """
+        Saves the current match and guru snapshots if they have changed since they were last saved.
+        """
+        if (self.snapshotDB is None): return
+        matches = self._matches
+        if (matches is not None and not matches.fromDisk and self._savedVersions.get("data") != matches.version):
+            state = self.matchSync.exportState()
+            if (state is not None):
+                await asyncio.to_thread(self.snapshotDB.save, "data", matches.version, {"version": matches.version, "state": state})
+                self._savedVersions["data"] = matches.version
+        gurus = self._gurus
+        if (gurus.isLoaded() and not gurus.fromDisk and self._savedVersions.get("guruData") != gurus.version):
+            records = gurus.exportRecords()
+            await asyncio.to_thread(self.snapshotDB.save, "guruData", gurus.version, {"version": gurus.version, "records": records})
+            self._savedVersions["guruData"] = gurus.version
+
+    async def start(self):
+        """Loads any saved snapshots, then starts the background refresh loop on the running event loop."""
+        if (self._refreshTask is not None): return
+        try:
+            await asyncio.to_thread(self.loadFromDisk)
+        except Exception as e:
+            print(f"Could not load saved snapshots: {e}")
+        self._refreshTask = asyncio.create_task(self._refreshLoop())
+
+    async def _refreshLoop(self):
+        sheetPriority.set(PRIORITY_BACKGROUND)
+        while True:
+            try:
+                await self.refreshMatches()
+                await self.refreshGurus()
+                await self.saveToDisk()
+            except Exception as e:
+                print(f"Snapshot refresh failed: {e}")
+            await asyncio.sleep(self.refreshInterval)
@@ -0,0 +1,96 @@
+from matchtable import MATCH_COLUMNS, rowsFromColumns, rowFromColumns
+
+class MatchSync:
+    """
+    Keeps an in-memory copy of the data worksheet current by downloading only the columns in MATCH_COLUMNS and applying only the rows that changed.
+    Rows are kept as Match records, and only the changed rows are rebuilt by a sync.
+
+    The first sync, and any sync where the header or the number of rows has changed, reloads the whole sheet.
+
+    Args:
+        worksheet: The data worksheet, wrapped in an AsyncWorksheet
+        columns: Names of the columns to keep
+    """
+    def __init__(self, worksheet, columns: list=MATCH_COLUMNS):
+        self.worksheet = worksheet
+        self.columns = columns
+        self.header = None
+        self.positions = {}
+        self.rowCount = 0
+        self.rows = None
+        self._raw = {}
+
+    def columnName(self, col: int):
+        """Returns the name of a sheet column, starting from 1, or None if it is not kept."""
+        if (self.header is None or col > len(self.header)): return None
+        name = self.header[col - 1]
+        return name if name in self.positions else None
+
+    async def sync(self):
+        """
+        Brings the in-memory copy up to date with the sheet.
+
+        Returns:
+            Returns a 2-tuple
+                rows: A list of the Match of every row, in sheet order
+                changedRows: A set of row positions that changed since the last sync, or None if the sheet was reloaded
+        """
+        if (self.rows is None or len(self.positions) == 0): return await self.reload()
+        from gspread.utils import rowcol_to_a1
+        ranges = []
+        for name in self.positions:
+            letter = rowcol_to_a1(1, self.positions[name])[:-1]
+            ranges.append(f"{letter}1:{letter}")
+        valueRanges = await self.worksheet.batch_get(ranges, major_dimension="COLUMNS")
+        rawColumns = {}
+        for name, valueRange in zip(self.positions, valueRanges):
+            values = valueRange[0] if len(valueRange) > 0 else []
+            if (len(values) == 0 or values[0] != name): return await self.reload()
+            rawColumns[name] = values[1:]
+        if (max(len(values) for values in rawColumns.values()) != self.rowCount): return await self.reload()
+        changes = {}
+        changedRows = set()
+        for name, values in rawColumns.items():
+            values = values + [""] * (self.rowCount - len(values))
+            previous = self._raw[name]
+            cells = {position: value for position, (value, old) in enumerate(zip(values, previous)) if value != old}
+            if (cells):
+                changes[name] = cells
+                changedRows.update(cells)
+            rawColumns[name] = values
+        self._raw = rawColumns
+        if (changes):
+            rows = list(self.rows)
+            for position in changedRows:
+                rows[position] = rowFromColumns(rawColumns, position)
+            self.rows = rows
+        return self.rows, changedRows
+
+    async def reload(self):
+        """Downloads the whole sheet and rebuilds the in-memory copy from scratch. Returns the same 2-tuple as sync."""
+        allValues = await self.worksheet.get_all_values()
+        header = allValues[0] if len(allValues) > 0 else []
+        rows = allValues[1:]
+        positions = {name: header.index(name) + 1 for name in self.columns if name in header}
+        rawColumns = {}
+        for name, col in positions.items():
+            rawColumns[name] = [row[col - 1] if col <= len(row) else "" for row in rows]
+        return self._setState(header, rawColumns, len(rows)), None
+
+    def _setState(self, header: list, rawColumns: dict, rowCount: int):
+        self.header = header
+        self.positions = {name: header.index(name) + 1 for name in rawColumns}
+        self.rowCount = rowCount
+        self._raw = rawColumns
+        self.rows = rowsFromColumns(rawColumns, rowCount)
+        return self.rows
+
+    def exportState(self):
+        """Returns the raw state of the last sync as a JSON serializable dictionary, or None if nothing has been synced."""
+        if (self.rows is None): return None
+        return {"header": self.header, "rowCount": self.rowCount, "raw": self._raw}
+
+    def restoreState(self, state: dict):
+        """Restores the state returned by exportState, so the next sync only applies what changed since it was saved. Returns the rebuilt rows."""
+        rawColumns = {name: values for name, values in state["raw"].items() if name in self.columns}
+        return self._setState(state["header"], rawColumns, state["rowCount"])
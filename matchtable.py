@@ -0,0 +1,213 @@
+import typing
+from functools import cached_property
+from operator import itemgetter
+
+from threadindex import ThreadIndex
+from metrics import metrics
+
+ALL_PODS = "All Pods"
+GURU_COLORS = ["R", "U", "G"]
+
+class Match(typing.NamedTuple):
+    """
+    One row of the data worksheet, with fields named after the sheet's column headers.
+
+    Text columns hold the cell text. Integer columns in COLUMN_DTYPES hold ints, with blank cells as 0.
+    Columns missing from the sheet hold the field's default.
+    """
+    FID: str = ""
+    PID: str = ""
+    NID: int = 0
+    IVID: int = 0
+    Rst: str = ""
+    P1Deck: str = ""
+    P2Deck: str = ""
+    RRs: str = ""
+    URs: str = ""
+    GRs: str = ""
+    RGuru: str = ""
+    UGuru: str = ""
+    GGuru: str = ""
+    RGu: int = 0
+    UGu: int = 0
+    GGu: int = 0
+    InDs: int = 0
+    Inc: int = 0
+    Des: int = 0
+    TLink: int = 0
+
+MATCH_COLUMNS = list(Match._fields)
+
+COLUMN_DTYPES = {
+    'FID': "str",
+    'PID': "category", 'Rst': "category",
+    'P1Deck': "category", 'P2Deck': "category",
+    'RRs': "category", 'URs': "category", 'GRs': "category",
+    'RGuru': "category", 'UGuru': "category", 'GGuru': "category",
+    'RGu': "int8", 'UGu': "int8", 'GGu': "int8",
+    'InDs': "int8", 'Inc': "int8", 'Des': "int8",
+    'NID': "int32", 'IVID': "int32",
+    'TLink': "int64"
+}
+INTEGER_COLUMNS = {name for name, dtype in COLUMN_DTYPES.items() if dtype.startswith("int")}
+
+def parseCell(name: str, value: str):
+    """
+    Converts the raw string of a match cell to the type its Match field holds.
+    A cell in an integer column that is not an integer is parsed the same way get_all_records does instead.
+    """
+    if (name not in INTEGER_COLUMNS): return value
+    if (value == ""): return 0
+    try:
+        return int(value)
+    except ValueError:
+        from gspread.utils import numericise
+        return numericise(value, empty2zero=False, default_blank="")
+
+def rowsFromColumns(rawColumns: dict, rowCount: int):
+    """
+    Builds the Match of every row from raw cell strings.
+
+    Args:
+        rawColumns: A dictionary of column name to the raw strings of that column, each rowCount long
+        rowCount: The number of match rows
+
+    Returns:
+        A list of Match in sheet order. Text cells are the same string objects as in rawColumns.
+    """
+    columns = []
+    for name in MATCH_COLUMNS:
+        values = rawColumns.get(name)
+        if (values is None): columns.append([Match._field_defaults[name]] * rowCount)
+        elif (name in INTEGER_COLUMNS): columns.append([parseCell(name, value) for value in values])
+        else: columns.append(values)
+    return list(map(Match._make, zip(*columns)))
+
+def rowFromColumns(rawColumns: dict, position: int):
+    """Builds the Match of one row position from raw cell strings, as rowsFromColumns would."""
+    return Match._make(parseCell(name, rawColumns[name][position]) if name in rawColumns else Match._field_defaults[name] for name in MATCH_COLUMNS)
+
+def replaceCells(rows: list, changes: dict):
+    """
+    Builds a new list of rows with some cells replaced, sharing every untouched Match with the original.
+
+    Args:
+        rows: The list of Match to start from
+        changes: A dictionary of column name to a dictionary of row position to the new raw cell string
+
+    Returns:
+        The new list of Match.
+    """
+    rows = list(rows)
+    for name, cells in changes.items():
+        for position, value in cells.items():
+            rows[position] = rows[position]._replace(**{name: parseCell(name, value)})
+    return rows
+
+def typedColumn(name: str, values: list):
+    """
+    Builds the pandas Series of one match column from its Match field values, using the compact dtype in COLUMN_DTYPES.
+    A column that does not fit its dtype is kept as plain objects instead.
+    """
+    import pandas as pd
+    try:
+        return pd.Series(values, dtype=COLUMN_DTYPES.get(name))
+    except (ValueError, TypeError, OverflowError):
+        return pd.Series(values)
+
+class MatchTable:
+    """
+    The match rows of one snapshot as Match records, with lookups by FID, pod and thread built on first use.
+
+    Single-match commands only read records through these lookups, so they never import pandas.
+    frame builds a DataFrame of the same rows for bulk analytics the first time one is needed.
+
+    Args:
+        rows: A list of Match in sheet order. Position 0 is sheet row 2
+        previous: The table this one replaces. Its thread index is patched with the changed rows and its DataFrame columns without changes are reused
+        changedRows: Row positions that differ from previous, or None if every row should be treated as changed
+    """
+    def __init__(self, rows: list, previous=None, changedRows: set=None):
+        self.rows = rows
+        self.changedRows = changedRows
+        self._previousThreadIndex = None
+        self._reusableColumns = {}
+        if (previous is None or changedRows is None or len(previous.rows) != len(rows)): return
+        self._previousThreadIndex = previous.__dict__.get('threadIndex')
+        frame = previous.__dict__.get('frame')
+        if (frame is not None):
+            changedColumns = {name for row in changedRows for name, old, new in zip(MATCH_COLUMNS, previous.rows[row], rows[row]) if old != new}
+            self._reusableColumns = {name: frame[name] for name in MATCH_COLUMNS if name not in changedColumns}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __getitem__(self, position: int):
+        return self.rows[position]
+
+    def column(self, name: str):
+        """Returns a list of one field of every row, in sheet order."""
+        return list(map(itemgetter(MATCH_COLUMNS.index(name)), self.rows))
+
+    @cached_property
+    def fidIndex(self):
+        """Dictionary of FID, such as "N II 113", to the position of the first row with it. Built on first use."""
+        fidIndex = {}
+        for position, match in enumerate(self.rows):
+            fidIndex.setdefault(match.FID, position)
+        return fidIndex
+
+    @cached_property
+    def duplicateFIDs(self):
+        """Set of FIDs that appear on more than one row, which cannot be resolved to a single match. Built on first use."""
+        if (len(self.fidIndex) == len(self.rows)): return set()
+        return {match.FID for position, match in enumerate(self.rows) if self.fidIndex[match.FID] != position}
+
+    @cached_property
+    def podIndex(self):
+        """Dictionary of pod code, such as "N II" or "E", to the positions of its rows in sheet order. Built on first use."""
+        podIndex = {}
+        for position, match in enumerate(self.rows):
+            podIndex.setdefault(match.PID, []).append(position)
+        return podIndex
+
+    @cached_property
+    def threadIndex(self):
+        """ThreadIndex of the TLink column, patched from the previous table's index when there is one. Built on first use."""
+        previous, self._previousThreadIndex = self._previousThreadIndex, None
+        if (previous is None): return ThreadIndex.build(self.column('TLink'))
+        return previous.updated({row: self.rows[row].TLink for row in self.changedRows})
+
+    @cached_property
+    def frame(self):
+        """DataFrame of every row with the compact dtypes in COLUMN_DTYPES, for bulk analytics. Imports pandas and is built on first use."""
+        import pandas as pd
+        with metrics.timed("table.frame"):
+            columns = {}
+            for index, name in enumerate(MATCH_COLUMNS):
+                column = self._reusableColumns.get(name)
+                columns[name] = column if column is not None else typedColumn(name, list(map(itemgetter(index), self.rows)))
+            self._reusableColumns = None
+            return pd.DataFrame(columns)
+
+    def find(self, fid: str):
+        """Returns the position of the match with a FID, or -1 if there is none or it is on more than one row."""
+        position = self.fidIndex.get(fid, -1)
+        if (position != -1 and fid in self.duplicateFIDs): return -1
+        return position
+
+    def inverseOf(self, position: int):
+        """Returns the position of the inverse of the match at a position, or -1 if it could not be found."""
+        match = self.rows[position]
+        return self.fidIndex.get(str(match.FID).rsplit(" ", 1)[0] + " " + str(match.IVID), -1)
+
+    def inPod(self, podCode: str):
+        """Returns the Match of every row in a pod, in sheet order."""
+        return [self.rows[position] for position in self.podIndex.get(podCode, ())]
+
+    def linkedTo(self, thread: int):
+        """Returns the Match of every row linked to a thread, in sheet order."""
+        return [self.rows[position] for position in self.threadIndex.rowsOf(thread)]
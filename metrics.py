@@ -0,0 +1,170 @@
+import os
+import json
+import time
+import asyncio
+import contextlib
+import contextvars
+from collections import Counter
+
+BUCKETS_MS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, float("inf")]
+
+class Histogram:
+    """
+    Latency histogram with fixed millisecond buckets, cheap enough to update on every call.
+
+    Percentiles are estimated as the upper edge of the bucket they fall in.
+    """
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS_MS)
+        self.count = 0
+        self.totalMs = 0
+        self.maxMs = 0
+
+    def observe(self, seconds: float):
+        ms = seconds * 1000
+        for bucket, edge in enumerate(BUCKETS_MS):
+            if (ms <= edge):
+                self.counts[bucket] += 1
+                break
+        self.count += 1
+        self.totalMs += ms
+        self.maxMs = max(self.maxMs, ms)
+
+    def percentile(self, fraction: float):
+        """Returns the estimated latency in milliseconds below which the given fraction of observations fall."""
+        if (self.count == 0): return 0
+        target = fraction * self.count
+        seen = 0
+        for edge, count in zip(BUCKETS_MS, self.counts):
+            seen += count
+            if (seen >= target): return min(edge, self.maxMs)
+        return self.maxMs
+
+    def export(self):
+        return {
+            "count": self.count,
+            "meanMs": self.totalMs / self.count if self.count else 0,
+            "p50Ms": self.percentile(0.5),
+            "p99Ms": self.percentile(0.99),
+            "maxMs": self.maxMs,
+            "buckets": {str(edge): count for edge, count in zip(BUCKETS_MS, self.counts)}
+        }
+
+metricsScope = contextvars.ContextVar("metricsScope", default=None)
+"""Guild ID of the tenant whose work the current task is doing, if any. Metrics recorded from the task are kept under it."""
+
+def scopedName(name: str, scope):
+    """Returns a metric name with a scope added after its first part, as in sheets.<guild>.data.batch_get, or the name as it is if scope is None."""
+    if (scope is None): return name
+    first, dot, rest = name.partition(".")
+    return f"{first}.{scope}{dot}{rest}"
+
+def unscopedName(name: str, scope):
+    """Returns a metric name without its scope, or None if it was not recorded under that scope. A scope of None matches every name."""
+    if (scope is None): return name
+    first, dot, rest = name.partition(".")
+    inScope, dot, rest = rest.partition(".")
+    if (inScope != str(scope)): return None
+    return f"{first}{dot}{rest}"
+
+class Metrics:
+    """
+    Process-wide counters and latency histograms for commands, Sheets calls and caches.
+
+    Names are dotted strings such as "command.getmatch" or "sheets.data.batch_get".
+    Metrics recorded while metricsScope is set get its guild ID after their first part, as in "sheets.<guild>.data.batch_get",
+    so every tenant's commands, Sheets calls and caches are kept apart.
+    Cache hit rates are kept as the counters name.hit and name.miss.
+    """
+    def __init__(self):
+        self.startedAt = time.time()
+        self.counters = Counter()
+        self.histograms = {}
+
+    def count(self, name: str, amount: int=1):
+        self.counters[scopedName(name, metricsScope.get())] += amount
+
+    def observe(self, name: str, seconds: float):
+        name = scopedName(name, metricsScope.get())
+        histogram = self.histograms.get(name)
+        if (histogram is None):
+            histogram = Histogram()
+            self.histograms[name] = histogram
+        histogram.observe(seconds)
+
+    @contextlib.contextmanager
+    def timed(self, name: str):
+        """Times the enclosed block into the histogram name, counting name.error instead of timing it if it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.count(name + ".error")
+            raise
+        self.observe(name, time.perf_counter() - start)
+
+    def hit(self, name: str, isHit: bool):
+        self.count(name + (".hit" if isHit else ".miss"))
+
+    def hitRates(self):
+        """Returns a dictionary of cache name to its fraction of hits, for every cache that has been used."""
+        names = {counter.rsplit(".", 1)[0] for counter in self.counters if counter.endswith((".hit", ".miss"))}
+        return {name: self.counters[name + ".hit"] / (self.counters[name + ".hit"] + self.counters[name + ".miss"]) for name in sorted(names)}
+
+    def export(self):
+        """Returns every metric as a JSON serializable dictionary."""
+        return {
+            "startedAt": self.startedAt,
+            "exportedAt": time.time(),
+            "counters": dict(sorted(self.counters.items())),
+            "hitRates": self.hitRates(),
+            "histograms": {name: histogram.export() for name, histogram in sorted(self.histograms.items())}
+        }
+
+    def report(self, prefix: str="", scope=None):
+        """
+        Formats the metrics whose names start with prefix as discord message lines, each starting with a newline.
+
+        Args:
+            prefix: The start of the names to list, without any scope
+            scope: If given, only metrics recorded under this guild ID are listed, with the scope left out of their names
+        """
+        lines = []
+        for name, histogram in sorted(self.histograms.items()):
+            shown = unscopedName(name, scope)
+            if (shown is None or not shown.startswith(prefix)): continue
+            errors = self.counters[name + ".error"]
+            lines.append(f"\n`{shown}` {histogram.count} calls | p50 {histogram.percentile(0.5):.0f} ms | p99 {histogram.percentile(0.99):.0f} ms | max {histogram.maxMs:.0f} ms" + (f" | {errors} errors" if errors else ""))
+        for name, rate in self.hitRates().items():
+            shown = unscopedName(name, scope)
+            if (shown is None or not shown.startswith(prefix)): continue
+            lines.append(f"\n`{shown}` {rate:.0%} hits of {self.counters[name + '.hit'] + self.counters[name + '.miss']}")
+        for name, value in sorted(self.counters.items()):
+            shown = unscopedName(name, scope)
+            if (shown is None or not shown.startswith(prefix) or name.endswith((".hit", ".miss", ".error"))): continue
+            lines.append(f"\n`{shown}` {value}")
+        return lines
+
+    def dump(self, path: str, data: dict=None):
+        """
+        Writes metrics to a JSON file, replacing it whole so readers never see half a dump. Blocks, so call it off the event loop.
+
+        Args:
+            path: The file to write
+            data: Metrics exported by export, defaulting to exporting them now
+        """
+        temporary = path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as output:
+            json.dump(self.export() if data is None else data, output, indent=1)
+        os.replace(temporary, path)
+
+    async def dumpEvery(self, path: str, interval: float):
+        """Dumps the metrics to path every interval seconds, forever. They are exported on the event loop and written on a thread."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.dump, path, self.export())
+            except OSError as e:
+                print(f"Could not write metrics to {path}: {e}")
+
+metrics = Metrics()
@@ -0,0 +1,62 @@
+import discord
+
+class PageView(discord.ui.View):
+    """
+    Buttons to flip through the pages of a long message, backed by the pages already rendered for the query.
+
+    Args:
+        pages: The page strings to flip through
+        ownerID: Discord ID of the user who ran the command. Only they can flip pages
+        timeout: Seconds of inactivity before the buttons stop working
+    """
+    def __init__(self, pages: list, ownerID: int, timeout: float=600):
+        super().__init__(timeout=timeout)
+        self.pages = pages
+        self.ownerID = ownerID
+        self.page = 0
+        self.message = None
+        self._refreshButtons()
+
+    def _refreshButtons(self):
+        self.previousPage.disabled = self.page == 0
+        self.nextPage.disabled = self.page == len(self.pages) - 1
+        self.pageCounter.label = f"{self.page + 1}/{len(self.pages)}"
+
+    async def interaction_check(self, interaction: discord.Interaction):
+        if (interaction.user.id == self.ownerID): return True
+        await interaction.response.send_message("Only the person who ran this command can change its page", ephemeral=True)
+        return False
+
+    async def _showPage(self, interaction: discord.Interaction, page: int):
+        self.page = max(0, min(page, len(self.pages) - 1))
+        self._refreshButtons()
+        await interaction.response.edit_message(content=self.pages[self.page], view=self)
+
+    @discord.ui.button(label="◀", style=discord.ButtonStyle.secondary)
+    async def previousPage(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._showPage(interaction, self.page - 1)
+
+    @discord.ui.button(label="1/1", style=discord.ButtonStyle.secondary, disabled=True)
+    async def pageCounter(self, interaction: discord.Interaction, button: discord.ui.Button):
+        pass
+
+    @discord.ui.button(label="▶", style=discord.ButtonStyle.secondary)
+    async def nextPage(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._showPage(interaction, self.page + 1)
+
+    async def on_timeout(self):
+        if (self.message is None): return
+        try:
+            await self.message.edit(view=None)
+        except discord.HTTPException:
+            pass
+
+async def sendPages(interaction: discord.Interaction, pages: list, ephemeral: bool=False):
+    """
+    Sends rendered pages as a followup to a deferred interaction, with PageView buttons if there is more than one page.
+    """
+    if (len(pages) == 1):
+        await interaction.followup.send(pages[0], ephemeral=ephemeral)
+        return
+    view = PageView(pages, interaction.user.id)
+    view.message = await interaction.followup.send(pages[0], view=view, ephemeral=ephemeral, wait=True)
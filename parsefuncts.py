@@ -1,6 +1,9 @@
 import re
-import pandas as pd
+import typing
 from strings import *
+from gururegistry import GuruRegistry
+from matchtable import MatchTable
+if (typing.TYPE_CHECKING): import pandas as pd
 
 def parseMatchID(input: str):
     """
@@ -35,6 +38,48 @@ def parseMatchID(input: str):
         return -1, -1, -1, -1
     return podLetter, podNumber, matchNumber, fullName+" "+matchNumber
 
+MAX_BULK_MATCHES = 50
+
+def parseMatchIDs(input: str):
+    """
+    Parses strings as a list of match ids, separated by commas, where each one is a match id or a range of match numbers in one pod.
+    Later ids may leave out the pod to reuse the one before, so "N II 100-103, 110, A I 5" is five matches.
+
+    Args:
+        input: The string to parse.
+
+    Returns:
+        Returns a list of 4-tuples as returned by parseMatchID, without repeats and in the order given.
+        If any part fails to parse, or the list is longer than MAX_BULK_MATCHES, returns -1 instead.
+    """
+    parsed = []
+    podID = None
+    for chunk in input.split(","):
+        chunk = chunk.strip()
+        if (chunk == ""): continue
+        rangeMatch = re.fullmatch(r"(.*?)(\d+)\s*-\s*(\d+)", chunk)
+        if (rangeMatch):
+            prefix, first, last = rangeMatch.group(1).strip(), int(rangeMatch.group(2)), int(rangeMatch.group(3))
+        else:
+            prefix, first, last = chunk, None, None
+        if (prefix == "" or (first is None and prefix.isnumeric())):
+            if (podID is None): return -1
+            prefix = podID + " " + prefix if first is None else podID
+        if (first is None):
+            podLetter, podNumber, matchNumber, fullName = parseMatchID(prefix)
+            if (fullName == -1): return -1
+            parsed.append((podLetter, podNumber, matchNumber, fullName))
+        else:
+            if (last < first or last - first >= MAX_BULK_MATCHES): return -1
+            for number in range(first, last + 1):
+                podLetter, podNumber, matchNumber, fullName = parseMatchID(f"{prefix} {number}")
+                if (fullName == -1): return -1
+                parsed.append((podLetter, podNumber, matchNumber, fullName))
+        podID = podLetter if podLetter == "E" else podLetter + " " + podNumber
+    parsed = list(dict.fromkeys(parsed))
+    if (len(parsed) == 0 or len(parsed) > MAX_BULK_MATCHES): return -1
+    return parsed
+
 def parsePodID(input: str):
     """
     Parses strings as one of several common Pod id formats.
@@ -78,14 +123,14 @@ def parsePodID(input: str):
         fullName = LETTER2NAME.get(podLetter)+" "+podNumber    
     return podLetter, podNumber, fullName
 
-def formatMatch(matchData: dict, ping: bool, allGurus: pd.DataFrame=None):
+def formatMatch(matchData: dict, ping: bool, allGurus: GuruRegistry=None):
     """
     Formats a match's data into a discord mesage summary
 
     Args:
         matchData: A dictionary of match data, as returned by getMatchData
         ping: A boolean that if true will attemp to turn any signatures into pings of the guru registered to that signature
-        allGurus: A DataFrame used to match guru signatures to discord IDs
+        allGurus: A GuruRegistry used to match guru signatures to discord IDs
 
     Returns:
         A string formated to be a discord message as used by /getmatch and others.
@@ -103,15 +148,15 @@ def formatMatch(matchData: dict, ping: bool, allGurus: pd.DataFrame=None):
     matchSummary += f"\n> \n> Inverse - `{matchData['inverseEmoji']}` {matchData['inverseID']}"
     return matchSummary
 
-def getMatchData(podLetter: str, podNumber: str, matchNumber: str, allMatches: pd.DataFrame):
+def getMatchData(podLetter: str, podNumber: str, matchNumber: str, allMatches: MatchTable):
     """
-    Pulls match data from a specified match up from the provided match data DatFrame
+    Pulls match data from a specified match up from the provided MatchTable
 
     Args:
         podLetter: The one-letter code for the pod type of the match to pull
         podNumber: The roman neumeral pod number, or 0-if the pod is Exemplar, of the match to pull
         matchNumber: The match ID number of the match to pull
-        allMatches: A dataframe of all match result data
+        allMatches: A MatchTable of all match result data
 
     Returns:
         Returns a dictionary. If the match is not found, matchExists with be the only parameter and will be set to false. Otherwise, it will have
@@ -131,15 +176,16 @@ def getMatchData(podLetter: str, podNumber: str, matchNumber: str, allMatches: p
             rowNumber: The row in the google sheet this match is in
     """
     matchID = podLetter+" "+podNumber+" "+matchNumber
-    rowIndex = (allMatches.index[allMatches['FID'] == matchID]).values
-    if (len(rowIndex) != 1): return {"matchExists": False}
-    row = rowIndex[0]
-    invID = podLetter + " " + podNumber + " " + str(allMatches['IVID'].iloc[row])
-    result = str(allMatches['Rst'].iloc[row])
+    row = allMatches.find(matchID)
+    if (row == -1): return {"matchExists": False}
+    match = allMatches[row]
+    invRow = allMatches.inverseOf(row)
+    result = str(match.Rst)
     try:
-        invRow = (allMatches.index[allMatches['FID'] == invID]).values[0]
-        invResRaw = str(allMatches['Rst'].iloc[invRow])
-        if(RESULT2NUM.get(result,-1)>=0 and RESULT2NUM.get(invResRaw,-1)>=0 and RESULT2NUM[result] < RESULT2NUM["1"] - RESULT2NUM[invResRaw]):
+        if (invRow == -1): raise KeyError(matchID)
+        invResRaw = str(allMatches[invRow].Rst)
+        errorSuspected = RESULT2NUM.get(result,-1)>=0 and RESULT2NUM.get(invResRaw,-1)>=0 and RESULT2NUM[result] < RESULT2NUM["1"] - RESULT2NUM[invResRaw]
+        if(errorSuspected):
             invEmoji = INV2EMOJI.get(invResRaw) + " ⚠️ Error Suspected ⚠️"
         else:
             invEmoji = INV2EMOJI.get(invResRaw,"⚪ -")
@@ -147,106 +193,168 @@ def getMatchData(podLetter: str, podNumber: str, matchNumber: str, allMatches: p
         invEmoji = "⚪ -"
     return {
         "matchExists": True,
-        "deckA": str(allMatches['P1Deck'].iloc[row]),
-        "deckB": str(allMatches['P2Deck'].iloc[row]),
-        "resultR": RESULT2EMOJI.get(str(allMatches['RRs'].iloc[row]),"⚪ -"),
-        "guruR": str(allMatches['RGuru'].iloc[row]),
-        "resultU": RESULT2EMOJI.get(str(allMatches['URs'].iloc[row]),"⚪ -"),
-        "guruU": str(allMatches['UGuru'].iloc[row]),
-        "resultG": RESULT2EMOJI.get(str(allMatches['GRs'].iloc[row]),"⚪ -"),
-        "guruG": str(allMatches['GGuru'].iloc[row]),
+        "deckA": str(match.P1Deck),
+        "deckB": str(match.P2Deck),
+        "resultR": RESULT2EMOJI.get(str(match.RRs),"⚪ -"),
+        "guruR": str(match.RGuru),
+        "resultU": RESULT2EMOJI.get(str(match.URs),"⚪ -"),
+        "guruU": str(match.UGuru),
+        "resultG": RESULT2EMOJI.get(str(match.GRs),"⚪ -"),
+        "guruG": str(match.GGuru),
         "result": result,
-        "inverseID": LETTER2NAME.get(podLetter)+" "+((podNumber+" ") if podLetter!="E" else "")+str(allMatches['IVID'].iloc[row]),
+        "inverseID": LETTER2NAME.get(podLetter)+" "+((podNumber+" ") if podLetter!="E" else "")+str(match.IVID),
         "inverseEmoji": invEmoji,
-        "linkedID": str(allMatches['TLink'].iloc[row]),
+        "linkedID": str(match.TLink),
         "rowNumber": row + 2
     }
 
-def getGuruString(guru: str, ping: bool, allGurus: pd.DataFrame=None):
+def getGuruString(guru: str, ping: bool, allGurus: GuruRegistry=None):
     """
     Turns guru signatures into the string to be used in the discord message
 
     Args:
         guru: The signature
         ping: A boolean that if true will attemp to turn the into pings of the guru registered to that signature
-        allGurus: A DataFrame used to match guru signatures to discord IDs
+        allGurus: A GuruRegistry used to match guru signatures to discord IDs
 
     Returns:
-        A sting. If ping is false, it will return exactly the input signature.
+        A sting. If ping is false or the signature is not registered, it will return exactly the input signature.
     """
-    if(not ping): return guru
-    try:
-        strippedGuru = guru.strip().casefold()
-        guruRow = (allGurus.index[allGurus['NAME'] == strippedGuru]).values[0]
-        guruID = str(allGurus['GURUID'].iloc[guruRow])
-        return f"<@{guruID}>"
-    except:
-        return guru
+    if(not ping or allGurus is None): return guru
+    guruID = allGurus.getID(guru)
+    if (guruID is None): return guru
+    return f"<@{guruID}>"
+
+def summaryLines(matches_df: "pd.DataFrame", incudePodID: bool):
+    """
+    Builds the listing line of every match in a DataFrame in one pass over its columns.
+
+    Args:
+        matches_df: DataFrame of the matches to list
+        incudePodID: A boolean for if the Pod ID should be used to identify matches
+
+    Returns:
+        Returns a 2-tuple of lists with one string per match, each starting with a newline
+            condLines: The condensed line with the linked thread, Pod ID if included, and match number
+            fullLines: The condensed line followed by both decks
+    """
+    condLines = []
+    fullLines = []
+    pods = matches_df['PID'].tolist() if incudePodID else [None] * len(matches_df)
+    for link, pod, nid, deckA, deckB in zip(matches_df['TLink'].tolist(), pods, matches_df['NID'].tolist(), matches_df['P1Deck'].tolist(), matches_df['P2Deck'].tolist()):
+        line = f"\n-"
+        if (link): 
+            line += f" <#{link}>"
+        if (incudePodID): 
+            line += f" {pod}"
+        line += f" {nid}"
+        condLines.append(line)
+        fullLines.append(line + f": {deckA} vs {deckB}")
+    return condLines, fullLines
 
-def formatSummary(headerString: str, inc_df: pd.DataFrame, des_df: pd.DataFrame, incudePodID: bool, skipInc: bool, incName: str):
+def formatSummaryPages(headerString: str, inc_df: "pd.DataFrame", des_df: "pd.DataFrame", incudePodID: bool, skipInc: bool, incName: str, pageLimit: int=2000):
     """
-    Creates a summary message from DataFrames of incomplete and discrepancy matches.
+    Creates a summary from DataFrames of incomplete and discrepancy matches, split into as many discord messages as it takes to list every match.
 
     Args:
-        headerString: The string to be the first line of the discord message
+        headerString: The string to be the first line of every page
         inc_df: DataFrame of of matches that have not been completed
         des_df: DataFrame of of matches that are discrepancies
         incudePodID: A boolean for if the Pod ID should be used to identify matches
-        skipInc: A boolen to not list any incomplete matches, even if it could fit
+        skipInc: A boolen to not list any incomplete matches
         incName: What to call incomplete matches
+        pageLimit: The most characters a page may have, per discord limits
+
+    Returns:
+        A list of strings formated for discord mesages, each starting with the header string.
+        If every match fits on one page, the densest layout that fits is used, dropping decks from incomplete matches and then discrepancies as needed.
+        Otherwise every match is listed with its decks across several pages.
+        The layout is chosen from the lengths of the lines, and only the chosen layout is joined into strings.
+    """
+    desTitle = f"\nDiscrepancies"
+    incTitle = f"\n{incName}"
+    desCond, desFull = summaryLines(des_df, incudePodID) if len(des_df) > 0 else ([], [])
+    incCond, incFull = summaryLines(inc_df, incudePodID) if len(inc_df) > 0 and not skipInc else ([], [])
+    for desLines, incLines in [(desFull, incFull), (desFull, incCond), (desCond, incCond)]:
+        sections = [(desTitle, desLines), (incTitle, incLines)]
+        length = len(headerString) + sum(len(title) + sum(map(len, lines)) for title, lines in sections if lines)
+        if (length <= pageLimit): return paginateLines(headerString, sections, pageLimit)
+    return paginateLines(headerString, [(desTitle, desFull), (incTitle, incFull)], pageLimit)
+
+def paginateLines(headerString: str, sections: list, pageLimit: int=2000):
+    """
+    Packs titled sections of lines into pages of at most pageLimit characters.
+
+    Args:
+        headerString: The string to start every page with
+        sections: A list of 2-tuples of a section title and its lines, each starting with a newline. Empty sections are left out
+        pageLimit: The most characters a page may have
 
     Returns:
-        A string formated for a discord mesage of the header string followed by a listing of the matches and linked threads as space allows.
-        Will attemp to return a message no longer than 2000 charactrers per discord limits, returning the header sting if none fit.
-        Read more about the choices made to limit mesage size in the bot documentation. 
-    """
-    if(len(des_df) <= 25 and len(des_df) > 0):
-        desFull = desCond = f"\nDiscrepancies"
-        for index, row in des_df.iterrows():
-            line = f"\n-"
-            if (row['TLink']): 
-                line += f" <#{row['TLink']}>"
-            if (incudePodID): 
-                line += f" {row['PID']}"
-            line += f" {row['NID']}"
-            desFull += line + f": {row['P1Deck']} vs {row['P2Deck']}"
-            desCond += line
-    else: desFull = desCond = f""
-    if(len(inc_df) <= 25 and len(inc_df) > 0 and len(des_df) + len(inc_df) <= 30 and not skipInc):
-        incFull = incCond = f"\n{incName}"
-        for index, row in inc_df.iterrows():
-            line = f"\n-"
-            if (row['TLink']): 
-                line += f" <#{row['TLink']}>"
-            if (incudePodID): 
-                line += f" {row['PID']}"
-            line += f" {row['NID']}"
-            incFull += line + f": {row['P1Deck']} vs {row['P2Deck']}"
-            incCond += line
-    else: incFull = incCond = f""
-    if (2000 >= len(headerString) + len(desFull) + len(incFull)): return  headerString + desFull + incFull
-    if (2000 >= len(headerString) + len(desFull) + len(incCond)): return  headerString + desFull + incCond
-    if (2000 >= len(headerString) + len(desCond) + len(incCond)): return  headerString + desCond + incCond
-    if (2000 >= len(headerString) + len(desFull)): return  headerString + desFull
-    if (2000 >= len(headerString) + len(desCond)): return  headerString + desCond
-    return headerString
-
-def threadSummary(linked_df: pd.DataFrame):
+        A list of page strings. A section that continues onto a new page repeats its title there.
+    """
+    pages = []
+    parts = [headerString]
+    length = len(headerString)
+    pageSection = None
+    for section, (title, lines) in enumerate(sections):
+        for line in lines:
+            extra = len(line) + (len(title) if pageSection != section else 0)
+            if (length + extra > pageLimit and len(parts) > 1):
+                pages.append("".join(parts))
+                parts = [headerString]
+                length = len(headerString)
+                pageSection = None
+            if (pageSection != section):
+                parts.append(title)
+                length += len(title)
+                pageSection = section
+            line = line[:max(pageLimit - length, 0)]
+            parts.append(line)
+            length += len(line)
+    pages.append("".join(parts))
+    return pages
+
+def formatMatchPages(matchIDs: list, allMatches: MatchTable, render, pageLimit: int=2000):
+    """
+    Looks up several matches in the same MatchTable and packs them into discord message pages.
+
+    Args:
+        matchIDs: A list of 4-tuples as returned by parseMatchIDs
+        allMatches: A MatchTable of all match result data
+        render: A function taking a match's data, as returned by getMatchData, and returning the lines to show for it
+        pageLimit: The most characters a page may have
+
+    Returns:
+        A list of page strings, listing each match found under its full name and then any that could not be found.
+    """
+    sections = []
+    missing = []
+    for podLetter, podNumber, matchNumber, fullName in matchIDs:
+        matchData = getMatchData(podLetter, podNumber, matchNumber, allMatches)
+        if (matchData.get("matchExists")):
+            sections.append((f"\n**{fullName}**", ["\n" + line for line in render(matchData).split("\n")]))
+        else:
+            missing.append(f"\n> {fullName}")
+    sections.append(("\n**Could not find**", missing))
+    return paginateLines(f"{len(matchIDs)} matches", sections, pageLimit)
+
+def threadSummary(linkedMatches: list):
     """
     Lists each guru's result on all provided matches in an extremely compact discord mesage format.
 
     Args:
-        linked_df: A DataFrame of the matches to list.
+        linkedMatches: A list of the Match records to list.
 
     Returns:
         Returns a monospaced formated discord mesage as a small grid listing all matches and each guru's result.
     """
-    summary =f"```\nMatch ID  |🟥🟦🟩"
-    for index, row in linked_df.iterrows():
-        names=row["FID"].split(" ")
+    parts = [f"```\nMatch ID  |🟥🟦🟩"]
+    for match in linkedMatches:
+        names=match.FID.split(" ")
         if (names[1]=="0"):
             names[1] = ""
-        summary += f"\n"+names[0]+" "+names[1].ljust(3)+" "+names[2].ljust(4)
-        summary +=f"|"+RESULT2SHORTEMOJI.get(row['RRs'],"⚪")+RESULT2SHORTEMOJI.get(row['URs'],"⚪")+RESULT2SHORTEMOJI.get(row['GRs'],"⚪")
-    summary += f"```"
-    return summary
\ No newline at end of file
+        parts.append(f"\n"+names[0]+" "+names[1].ljust(3)+" "+names[2].ljust(4))
+        parts.append(f"|"+RESULT2SHORTEMOJI.get(match.RRs,"⚪")+RESULT2SHORTEMOJI.get(match.URs,"⚪")+RESULT2SHORTEMOJI.get(match.GRs,"⚪"))
+    parts.append(f"```")
+    return "".join(parts)
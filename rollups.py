@@ -0,0 +1,137 @@
+import pandas as pd
+
+from strings import RESULT2NUM
+from gururegistry import normalizeSignature
+from matchtable import ALL_PODS, GURU_COLORS
+
+class PodRollup:
+    """
+    The incomplete and discrepancy matches of one pod, with the totals /summary reports.
+
+    Args:
+        inc_df: DataFrame of the pod's matches that have not been completed
+        des_df: DataFrame of the pod's matches that are discrepancies
+    """
+    def __init__(self, inc_df: pd.DataFrame, des_df: pd.DataFrame):
+        self.inc_df = inc_df
+        self.des_df = des_df
+        self.totalInc = len(inc_df)
+        self.totalDes = len(des_df)
+        self.totalR = inc_df['RGu'].sum()
+        self.totalU = inc_df['UGu'].sum()
+        self.totalG = inc_df['GGu'].sum()
+
+def rollupOf(incdes_df: pd.DataFrame):
+    """Builds a PodRollup from a DataFrame of matches that are incomplete or discrepancies."""
+    return PodRollup(incdes_df[incdes_df['Inc'] == 1], incdes_df[incdes_df['Des'] == 1])
+
+def buildRollups(allMatches: pd.DataFrame, reusable: dict=None):
+    """
+    Builds a PodRollup for every pod code and for ALL_PODS.
+
+    Args:
+        allMatches: A dataframe of all match result data
+        reusable: Rollups from an earlier snapshot of pods whose rows have not changed since, which are kept as they are
+
+    Returns:
+        A dictionary of pod code, such as "N II" or "E", to PodRollup. Pods with nothing remaining are left out.
+    """
+    reusable = reusable or {}
+    incdes_df = allMatches[allMatches['InDs'] == 1]
+    stale_df = incdes_df[~incdes_df['PID'].isin(reusable.keys())] if reusable else incdes_df
+    rollups = {pod: rollup for pod, rollup in reusable.items() if pod != ALL_PODS}
+    for pod, pod_df in stale_df.groupby('PID', sort=False, observed=True):
+        rollups[pod] = rollupOf(pod_df)
+    rollups[ALL_PODS] = reusable.get(ALL_PODS) or rollupOf(incdes_df)
+    return rollups
+
+def emptyRollup(allMatches: pd.DataFrame):
+    """Returns a PodRollup with no matches, for pods that have nothing remaining."""
+    return rollupOf(allMatches.iloc[0:0])
+
+class GuruWorkload:
+    """
+    The incomplete and discrepancy matches one guru is signed up for, with the totals /gurusummary reports.
+
+    Args:
+        inc_df: DataFrame of the guru's matches that have not been completed
+        unf_df: DataFrame of the guru's incomplete matches that the guru has not filled in
+        des_df: DataFrame of the guru's matches that are discrepancies
+    """
+    def __init__(self, inc_df: pd.DataFrame, unf_df: pd.DataFrame, des_df: pd.DataFrame):
+        self.inc_df = inc_df
+        self.unf_df = unf_df
+        self.des_df = des_df
+        self.totalInc = len(inc_df)
+        self.totalUnf = len(unf_df)
+        self.totalDes = len(des_df)
+
+def buildGuruIndex(allMatches: pd.DataFrame):
+    """
+    Builds an inverted index from guru to the incomplete and discrepancy matches they are signed up for.
+
+    Args:
+        allMatches: A dataframe of all match result data
+
+    Returns:
+        A dictionary of normalized guru signature to a list of 3-tuples, in row order for each color
+            row: The position of the match in allMatches
+            color: One of GURU_COLORS
+            filled: Whether the guru has entered a result for that color
+    """
+    pending = allMatches['InDs'] == 1
+    positions = [position for position, isPending in enumerate(pending.tolist()) if isPending]
+    guruIndex = {}
+    for color in GURU_COLORS:
+        gurus = allMatches[color+'Guru'][pending].astype(str).str.strip().str.casefold().tolist()
+        filled = (allMatches[color+'Rs'][pending] != "").tolist()
+        for row, guru, isFilled in zip(positions, gurus, filled):
+            guruIndex.setdefault(guru, []).append((row, color, isFilled))
+    return guruIndex
+
+def guruWorkload(allMatches: pd.DataFrame, guruIndex: dict, guru: str, podCode: str=None):
+    """
+    Looks up a guru's remaining matches in an index built by buildGuruIndex, in time proportional to the guru's own matches.
+
+    Args:
+        allMatches: The dataframe the index was built from
+        guruIndex: The index built by buildGuruIndex
+        guru: The guru's signature, in any case or spacing
+        podCode: If given, only matches in this pod are included
+
+    Returns:
+        A GuruWorkload of the guru's matches, in sheet order.
+    """
+    unfilledRows = {}
+    for row, color, filled in guruIndex.get(normalizeSignature(guru), []):
+        unfilledRows[row] = unfilledRows.get(row, False) or not filled
+    positions = sorted(unfilledRows)
+    if (podCode is not None):
+        pods = allMatches['PID']
+        positions = [row for row in positions if pods.iat[row] == podCode]
+    incdes_df = allMatches.iloc[positions]
+    isInc = incdes_df['Inc'] == 1
+    isUnfilled = pd.Series([unfilledRows[row] for row in positions], index=incdes_df.index, dtype=bool)
+    return GuruWorkload(incdes_df[isInc], incdes_df[isInc & isUnfilled], incdes_df[incdes_df['Des'] == 1])
+
+def findInverseErrors(allMatches: pd.DataFrame):
+    """
+    Checks every match against its inverse match in the same pod at once
+
+    Args:
+        allMatches: A dataframe of all match result data
+
+    Returns:
+        A boolean Series aligned with allMatches that is True where the match's result and its inverse's result are inconsistent.
+        Matches without a finished result or without a finished inverse are never flagged.
+    """
+    results = allMatches['Rst'].astype(str).map(RESULT2NUM)
+    fids = allMatches['FID'].astype(str)
+    invIDs = fids.str.rsplit(" ", n=1).str[0] + " " + allMatches['IVID'].astype(str)
+    firstRows = pd.Series(range(len(allMatches)), index=fids.values)
+    firstRows = firstRows[~firstRows.index.duplicated()]
+    invRows = invIDs.map(firstRows)
+    hasInverse = invRows.notna()
+    invResults = pd.Series(float("nan"), index=allMatches.index)
+    invResults[hasInverse] = results.to_numpy()[invRows[hasInverse].astype(int).to_numpy()]
+    return (results < RESULT2NUM["1"] - invResults).fillna(False).astype(bool)
@@ -0,0 +1,285 @@
+import asyncio
+import contextvars
+import functools
+import heapq
+import itertools
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import metrics
+
+PRIORITY_WRITE = 0
+PRIORITY_READ = 1
+PRIORITY_BACKGROUND = 2
+
+sheetPriority = contextvars.ContextVar("sheetPriority", default=PRIORITY_READ)
+"""Priority of Sheets reads made from the current task. The background refresh loop lowers it to PRIORITY_BACKGROUND."""
+
+class SharedPriority:
+    """
+    Priority of a call shared through SingleFlight, raised to the most urgent priority of the callers waiting on it.
+    Listeners are told every time it is raised, so a call already waiting for quota can move up the queue.
+
+    Args:
+        priority: The priority of the caller that started the call
+    """
+    def __init__(self, priority: int):
+        self.priority = priority
+        self._listeners = []
+
+    def raiseTo(self, priority: int):
+        if (priority >= self.priority): return
+        self.priority = priority
+        for listener in list(self._listeners):
+            listener(priority)
+
+    def listen(self, listener):
+        self._listeners.append(listener)
+
+    def unlisten(self, listener):
+        if (listener in self._listeners): self._listeners.remove(listener)
+
+sharedPriority = contextvars.ContextVar("sharedPriority", default=None)
+"""SharedPriority of the SingleFlight call the current task is running, if any."""
+
+def currentPriority():
+    """Returns the priority Sheets calls from the current task wait at: sheetPriority, or sooner if a caller sharing the call needs it."""
+    shared = sharedPriority.get()
+    if (shared is None): return sheetPriority.get()
+    return min(sheetPriority.get(), shared.priority)
+
+class SingleFlight:
+    """
+    Shares one in-flight call between every concurrent caller asking for the same key.
+
+    The first caller starts the call and later callers await the same result, so a burst of identical reads costs one request.
+    A caller being cancelled does not cancel the shared call.
+    A caller joining a call with a more urgent priority raises the call's SharedPriority, so it never waits at a background priority.
+
+    Args:
+        name: If given, callers that share a call are counted as hits of this name in metrics
+    """
+    def __init__(self, name: str=None):
+        self.name = name
+        self._calls = {}
+
+    async def do(self, key, func, *args, **kwargs):
+        call = self._calls.get(key)
+        if (self.name is not None): metrics.hit(self.name, call is not None and not call[0].done())
+        if (call is None or call[0].done()):
+            shared = SharedPriority(currentPriority())
+            call = (asyncio.ensure_future(self._run(shared, sharedPriority.get(), func(*args, **kwargs))), shared)
+            self._calls[key] = call
+            call[0].add_done_callback(lambda done: self._forget(key, done))
+        else:
+            call[1].raiseTo(currentPriority())
+        return await asyncio.shield(call[0])
+
+    async def _run(self, shared: SharedPriority, parent: SharedPriority, awaitable):
+        sharedPriority.set(shared)
+        if (parent is not None): parent.listen(shared.raiseTo)
+        try:
+            return await awaitable
+        finally:
+            if (parent is not None): parent.unlisten(shared.raiseTo)
+
+    def _forget(self, key, task):
+        if (self._calls.get(key, (None,))[0] is task): del self._calls[key]
+
+class QuotaExhausted(Exception):
+    """Raised when a Sheets call could not get through the SheetScheduler's quota in time."""
+
+def isRetryable(error: Exception):
+    """Returns whether a failed Sheets call is worth retrying: a rate limit or a server error."""
+    from gspread.exceptions import APIError
+    if (not isinstance(error, APIError)): return False
+    status = getattr(error.response, "status_code", error.code)
+    return status == 429 or status >= 500
+
+class SheetScheduler:
+    """
+    Central gate every Sheets API call goes through, so the bot stays inside Google's per-minute quota.
+
+    The quota is tracked with a token bucket holding up to burst calls and refilling at requestsPerMinute.
+    When calls have to wait, lower priority numbers go first, so user writes overtake user reads and user reads overtake background refreshes.
+    A call that waits longer than its priority's entry in maxWaits raises QuotaExhausted instead.
+    A call made for a SingleFlight moves up the queue when a more urgent caller joins it, and gets that caller's maxWait from then on.
+    Calls that fail with a rate limit or server error are retried with jittered exponential backoff,
+    and a rate limit also pauses every other call for the backoff.
+
+    Args:
+        requestsPerMinute: Sustained Sheets calls allowed per minute
+        burst: Calls that can be made at once after a quiet period
+        maxWaits: A dictionary of priority to the most seconds a call may wait for quota, or None to wait as long as it takes
+        retries: How many times a failed call is retried
+        backoffBase: Seconds before the first retry, doubled for each one after
+        backoffMax: The most seconds between retries
+    """
+    def __init__(self, requestsPerMinute: float=60, burst: int=10, maxWaits: dict=None, retries: int=4, backoffBase: float=1, backoffMax: float=32):
+        self.rate = requestsPerMinute / 60
+        self.burst = burst
+        self.maxWaits = maxWaits if maxWaits is not None else {PRIORITY_WRITE: 60, PRIORITY_READ: 10, PRIORITY_BACKGROUND: None}
+        self.retries = retries
+        self.backoffBase = backoffBase
+        self.backoffMax = backoffMax
+        self._tokens = burst
+        self._refilledAt = time.monotonic()
+        self._pausedUntil = 0
+        self._waiters = []
+        self._order = itertools.count()
+        self._dispatchTask = None
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilledAt) * self.rate)
+        self._refilledAt = now
+        return now
+
+    def pause(self, seconds: float):
+        """Holds back every call for the given number of seconds and empties the bucket, as after a rate limit."""
+        self._refill()
+        self._tokens = 0
+        self._pausedUntil = max(self._pausedUntil, time.monotonic() + seconds)
+
+    def _enqueue(self, priority: int, future):
+        heapq.heappush(self._waiters, (priority, next(self._order), future))
+        if (self._dispatchTask is None or self._dispatchTask.done()):
+            self._dispatchTask = asyncio.create_task(self._dispatch())
+
+    async def acquire(self, priority: int=PRIORITY_READ):
+        """
+        Waits until the bucket has a call to spare for this priority, raising QuotaExhausted if that takes longer than its maxWait.
+        Inside a SingleFlight call, the wait moves to the call's SharedPriority whenever that is more urgent.
+        """
+        shared = sharedPriority.get()
+        if (shared is not None): priority = min(priority, shared.priority)
+        future = asyncio.get_running_loop().create_future()
+        raised = asyncio.Event()
+        start = waitingSince = time.perf_counter()
+        def onRaise(newPriority):
+            nonlocal priority, waitingSince
+            if (newPriority >= priority or future.done()): return
+            priority, waitingSince = newPriority, time.perf_counter()
+            self._enqueue(priority, future)
+            raised.set()
+        self._enqueue(priority, future)
+        if (shared is not None): shared.listen(onRaise)
+        try:
+            while (not future.done()):
+                maxWait = self.maxWaits.get(priority)
+                remaining = None if maxWait is None else waitingSince + maxWait - time.perf_counter()
+                if (remaining is not None and remaining <= 0):
+                    metrics.count("sheets.quotaExhausted")
+                    raise QuotaExhausted(f"No Sheets quota available within {maxWait} seconds")
+                raised.clear()
+                wakeUp = asyncio.ensure_future(raised.wait())
+                try:
+                    await asyncio.wait([future, wakeUp], timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    wakeUp.cancel()
+        finally:
+            if (shared is not None): shared.unlisten(onRaise)
+            if (not future.done()): future.cancel()
+        metrics.observe("sheets.quotaWait", time.perf_counter() - start)
+
+    async def _dispatch(self):
+        while self._waiters:
+            if (self._waiters[0][2].done()):
+                heapq.heappop(self._waiters)
+                continue
+            now = self._refill()
+            if (now < self._pausedUntil):
+                await asyncio.sleep(self._pausedUntil - now)
+            elif (self._tokens < 1):
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+            else:
+                self._tokens -= 1
+                heapq.heappop(self._waiters)[2].set_result(None)
+
+    async def run(self, priority: int, call):
+        """
+        Makes a Sheets call once there is quota for it, retrying rate limits and server errors.
+
+        Args:
+            priority: PRIORITY_WRITE, PRIORITY_READ, or PRIORITY_BACKGROUND
+            call: A function with no arguments returning an awaitable that makes the call
+
+        Returns:
+            The call's result. Raises QuotaExhausted if quota never became available or every retry was rate limited.
+        """
+        for attempt in range(self.retries + 1):
+            await self.acquire(priority)
+            try:
+                return await call()
+            except Exception as e:
+                if (not isRetryable(e)): raise
+                metrics.count("sheets.retry")
+                rateLimited = getattr(e.response, "status_code", e.code) == 429
+                if (attempt == self.retries):
+                    if (rateLimited): raise QuotaExhausted(f"Sheets calls still rate limited after {self.retries} retries") from e
+                    raise
+                delay = min(self.backoffMax, self.backoffBase * 2 ** attempt) * random.uniform(0.5, 1)
+                if (rateLimited): self.pause(delay)
+                await asyncio.sleep(delay)
+
+class AsyncWorksheet:
+    """
+    Awaitable wrapper around a gspread Worksheet.
+
+    Every call runs on a bounded thread pool so a slow Sheets request never blocks the Discord event loop,
+    and commands from different users can wait on Google in parallel.
+    Concurrent identical reads share a single request through SingleFlight.
+    Every call is timed in metrics as sheets.<worksheet title>.<method>.
+    If a SheetScheduler is given, every call waits for quota from it. Writes use PRIORITY_WRITE and reads use the current sheetPriority.
+
+    Args:
+        worksheet: The gspread Worksheet to wrap, or a function that opens it. A function is called on the thread pool the first time the worksheet is used
+        executor: The thread pool the blocking calls run on, shared between worksheets
+        scheduler: The SheetScheduler shared between worksheets, if calls should be rate limited
+    """
+    def __init__(self, worksheet, executor: ThreadPoolExecutor, scheduler: SheetScheduler=None):
+        if (callable(worksheet)):
+            self.worksheet = None
+            self._opener = worksheet
+        else:
+            self.worksheet = worksheet
+            self._opener = None
+        self.executor = executor
+        self.scheduler = scheduler
+        self._reads = SingleFlight("sheets.sharedReads")
+
+    async def _call(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    async def _schedule(self, priority: int, name: str, func, *args, **kwargs):
+        with metrics.timed(f"sheets.{getattr(self.worksheet, 'title', 'sheet')}.{name}"):
+            if (self.scheduler is None): return await self._call(func, *args, **kwargs)
+            return await self.scheduler.run(priority, functools.partial(self._call, func, *args, **kwargs))
+
+    async def open(self):
+        """Returns the wrapped gspread Worksheet, opening it first if needed."""
+        if (self.worksheet is None):
+            self.worksheet = await self._reads.do("open", self._schedule, sheetPriority.get(), "open", self._opener)
+        return self.worksheet
+
+    async def _run(self, priority: int, name: str, *args, **kwargs):
+        worksheet = await self.open()
+        return await self._schedule(priority, name, getattr(worksheet, name), *args, **kwargs)
+
+    async def _read(self, name: str, *args, **kwargs):
+        key = (name, args, tuple(sorted(kwargs.items())))
+        return await self._reads.do(key, self._run, sheetPriority.get(), name, *args, **kwargs)
+
+    async def get_all_records(self, **kwargs):
+        return await self._read("get_all_records", **kwargs)
+
+    async def get_all_values(self, **kwargs):
+        return await self._read("get_all_values", **kwargs)
+
+    async def batch_get(self, ranges: list, **kwargs):
+        return await self._read("batch_get", tuple(ranges), **kwargs)
+
+    async def batch_update(self, data: list, **kwargs):
+        return await self._run(PRIORITY_WRITE, "batch_update", data, **kwargs)
@@ -0,0 +1,58 @@
+import json
+import sqlite3
+import time
+import zlib
+
+FORMAT_VERSION = 1
+
+class SnapshotDB:
+    """
+    Keeps the last good match and guru snapshots in a local SQLite file, so a restarted bot can answer commands before Google does.
+
+    Each sheet is saved as one row holding its columns as compressed JSON, stamped with FORMAT_VERSION and the snapshot version.
+    Files written with a different FORMAT_VERSION are ignored. Every method blocks, so call them off the event loop.
+
+    Args:
+        path: Where the SQLite file is kept
+    """
+    def __init__(self, path: str):
+        self.path = path
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path)
+        connection.execute("CREATE TABLE IF NOT EXISTS snapshots (sheet TEXT PRIMARY KEY, format INTEGER, version INTEGER, savedAt REAL, data BLOB)")
+        return connection
+
+    def save(self, sheet: str, version: int, data: dict):
+        """
+        Replaces the saved snapshot of a sheet.
+
+        Args:
+            sheet: Name of the sheet the snapshot is of
+            version: The snapshot version
+            data: The snapshot contents, which must be JSON serializable
+        """
+        blob = zlib.compress(json.dumps(data, separators=(",", ":")).encode())
+        with self._connect() as connection:
+            connection.execute("INSERT OR REPLACE INTO snapshots VALUES (?, ?, ?, ?, ?)", (sheet, FORMAT_VERSION, version, time.time(), blob))
+        connection.close()
+
+    def load(self, sheet: str):
+        """
+        Reads the saved snapshot of a sheet.
+
+        Args:
+            sheet: Name of the sheet the snapshot is of
+
+        Returns:
+            Returns the data dictionary passed to save, or None if there is no usable snapshot.
+        """
+        try:
+            with self._connect() as connection:
+                row = connection.execute("SELECT format, data FROM snapshots WHERE sheet = ?", (sheet,)).fetchone()
+            connection.close()
+        except sqlite3.Error as e:
+            print(f"Could not read saved snapshot of {sheet}: {e}")
+            return None
+        if (row is None or row[0] != FORMAT_VERSION): return None
+        return json.loads(zlib.decompress(row[1]))
@@ -56,9 +56,9 @@ RESULT2EMOJI = {
 }
 
 RESULT2SHORTEMOJI = {
-    0: "🔴",
-    0.5: "🟡",
-    1: "🔵"
+    "0": "🔴",
+    "0.5": "🟡",
+    "1": "🔵"
 }
 
 
@@ -69,19 +69,23 @@ INV2EMOJI = {
 }
 
 HELPTEXT = {
-    "getmatch": "Use with a Match ID to get a summary of that match in chat.\nThe optional parameter usediscordids can be used to toggle between signatures and discord mentions.",
-    "peekmatch": "Use with a Match ID to get a summary of that match that only you can see.\nThe optional parameter usediscordids can be used to toggle between signatures and discord mentions.",
-    "pingmatch": "Use with a Match ID and Memknight will list all gurus signed to the match, pinging any registered discords.",
+    "getmatch": "Use with a Match ID to get a summary of that match in chat. Several Match IDs or a range, separated by commas, are listed together in one reply with pages.\nThe optional parameter usediscordids can be used to toggle between signatures and discord mentions.",
+    "peekmatch": "Use with a Match ID to get a summary of that match that only you can see. Several Match IDs or a range, separated by commas, are listed together in one reply with pages.\nThe optional parameter usediscordids can be used to toggle between signatures and discord mentions.",
+    "pingmatch": "Use with a Match ID and Memknight will list all gurus signed to the match, pinging any registered discords. Several Match IDs or a range, separated by commas, can be pinged at once.",
     "writeup": "The longer alternative to /writeup, adding in /getmatch and /pingmatch.\nUsed in a guru-match-help thread with a Match ID to connect that thread to the match. The linked thread will be included in other commands that reference that match as well as on the sheet. Each match can only be linked to one thread at a time, but multiple matches can be linked to the same thread. It will also provide information about that match and ping all gurus on that match that have registered their name.",
-    "summary": "Used with a Pod ID to give information about the matches remaining in that pod.\nThe optional parameter privacystatus can be used to toggle between the summary being shown to everyone or only to you.\nThe optional parameter onlydiscrepancies can be used to toggle between only listing details for discrepancies or for all matches.",
-    "summaryall": "Give information about the matches remaining across all pods.\nThe optional parameter privacystatus can be used to toggle between the summary being shown to everyone or only to you.\nThe optional parameter onlydiscrepancies can be used to toggle between only listing details for discrepancies or for all matches.",
-    "gurusummary": "Used with a signature to give information about the matches remaining with that signature. Private by default.\nThe optional parameter podid can be used to limit this summary to only a single pod.\nThe optional parameter privacystatus can be used to toggle between the summary being shown to everyone or only to you.\nThe optional parameter onlydiscrepancies can be used to toggle between only listing details for discrepancies or for all matches.",
+    "summary": "Used with a Pod ID to give information about the matches remaining in that pod.\nThe optional parameter privacystatus can be used to toggle between the summary being shown to everyone or only to you.\nThe optional parameter onlydiscrepancies can be used to toggle between only listing details for discrepancies or for all matches.\nSummaries too long for one message are split into pages you can flip through with the buttons under the message.",
+    "summaryall": "Give information about the matches remaining across all pods.\nThe optional parameter privacystatus can be used to toggle between the summary being shown to everyone or only to you.\nThe optional parameter onlydiscrepancies can be used to toggle between only listing details for discrepancies or for all matches.\nSummaries too long for one message are split into pages you can flip through with the buttons under the message.",
+    "gurusummary": "Used with a signature to give information about the matches remaining with that signature. Private by default.\nThe optional parameter podid can be used to limit this summary to only a single pod.\nThe optional parameter privacystatus can be used to toggle between the summary being shown to everyone or only to you.\nThe optional parameter onlydiscrepancies can be used to toggle between only listing details for discrepancies or for all matches.\nSummaries too long for one message are split into pages you can flip through with the buttons under the message.",
     "tlink": "The shorter alternative to /writeup.\nUsed in a guru-match-help thread with a Match ID to connect that thread to the match. The linked thread will be included in other commands that reference that match as well as on the sheet. Each match can only be linked to one thread at a time, but multiple matches can be linked to the same thread.",
     "ulink": "Used with a Match ID to remove the link created by /tlink or /writeup.",
     "registerguru": "Use with the name you sign on the guru sheets. This is done so several other commands can ping the correct person. You can register to more than one name, and names are not case sensitive.",
     "unregisterguru": "Use with a name you have already registered to no longer be pinged when the signature is pinged.",
+    "mysignatures": "Privately lists every signature registered to your account with /registerguru.",
+    "changes": "Use with how far back to look, such as 30m, 2h or 1d, to list results entered, discrepancies raised or resolved, and threads linked since then, grouped by pod. Private by default.\nThe optional parameters podid and guru restrict the list to one pod or one guru. Changes are read from what Memknight has seen since it started, so nothing from before a restart is listed.",
+    "stats": "Server administrators only. Privately lists how long this server's commands and Google Sheets calls have taken since Memknight started, along with how often its caches answered without going to the sheet. Choose a section to list only part of it.",
     "discrepancyurl": "This function provides a private hyperlink to the guru match hub so you can access it anywhere.",
-    "Match IDs": "Multiple functions take an input of a Match ID, which is composed of a pod type, a pod number, and a match number. Several spacing patterns can be parsed. For Novice II 113, the accepted inputs are:\n- NII113\n- NII 113\n- N2 113\n- N II 113\n- N 2 113\n- Novice II 113\n- Novice 2 113\nThe exemplar pod does not have a pod number, so Exemplar 97 could be input as\n- E97\n- E 97\n- Exemplar 97",
+    "Match IDs": "Multiple functions take an input of a Match ID, which is composed of a pod type, a pod number, and a match number. Several spacing patterns can be parsed. For Novice II 113, the accepted inputs are:\n- NII113\n- NII 113\n- N2 113\n- N II 113\n- N 2 113\n- Novice II 113\n- Novice 2 113\nThe exemplar pod does not have a pod number, so Exemplar 97 could be input as\n- E97\n- E 97\n- Exemplar 97\n/getmatch, /peekmatch and /pingmatch also take several Match IDs separated by commas, or a range of match numbers. Later IDs can leave out the pod to use the one before, so N II 100-103, 110, A I 5 is five matches.",
 }
 
-DEFAULTHELPTEXT = "All of Memknight's commands are accessible by typing a slash at the start of a message. Add a parameter to /help to hear about a specific function, or read the full documentation here:\nhttps://docs.google.com/document/d/1q17rMTJsOicrJLAYlmSjVxT74e7WOUl-RxZC-5FqKxQ/edit?usp=sharing"
\ No newline at end of file
+DEFAULTHELPTEXT = "All of Memknight's commands are accessible by typing a slash at the start of a message. Add a parameter to /help to hear about a specific function, or read the full documentation here:\nhttps://docs.google.com/document/d/1q17rMTJsOicrJLAYlmSjVxT74e7WOUl-RxZC-5FqKxQ/edit?usp=sharing"
+WARMINGUPTEXT = "Memknight has just restarted and is still opening the match sheets. Please try again in a few seconds."
\ No newline at end of file
@@ -0,0 +1,108 @@
+import asyncio
+import json
+import os
+import time
+
+from matchstore import MatchStore
+from sheetio import AsyncWorksheet, SheetScheduler
+from metrics import metrics, metricsScope
+
+def tenantConfigs(environ: dict):
+    """
+    Reads the tournaments to serve from environment variables.
+
+    TENANTS_JSON holds a JSON list with one object per tenant, with the keys
+        guild: Discord ID of the tournament's server
+        sheet: Key of the spreadsheet holding its data and guruData worksheets
+        threads: Discord ID of the channel its match threads are made in
+        hub: Key of its guru match hub spreadsheet, optional
+        digestChannel: Discord ID of a channel to post its change digests to, optional
+        requestsPerMinute: Its share of the Sheets quota, optional
+        snapshotPath: Where its snapshots are saved, optional
+    Without TENANTS_JSON, one tenant is read from GUILD_ID, SHEET_KEY, MATCH_THREADS_ID, HUB_KEY and DIGEST_CHANNEL_ID.
+
+    Args:
+        environ: The environment variables, such as os.environ
+
+    Returns:
+        A list of dictionaries with every key above, holding None for optional keys that were left out.
+        A tenant without a snapshotPath saves to SNAPSHOT_PATH, with its guild ID added to the file name if there are several tenants.
+        Raises ValueError if a tenant is missing a required key or two tenants share a guild.
+    """
+    snapshotPath = environ.get('SNAPSHOT_PATH', 'memknight_snapshot.db')
+    if (environ.get('TENANTS_JSON')):
+        entries = json.loads(environ['TENANTS_JSON'])
+    else:
+        entries = [{
+            "guild": environ.get('GUILD_ID'), "sheet": environ.get('SHEET_KEY'), "threads": environ.get('MATCH_THREADS_ID'),
+            "hub": environ.get('HUB_KEY'), "digestChannel": environ.get('DIGEST_CHANNEL_ID'), "snapshotPath": snapshotPath
+        }]
+    configs = []
+    for entry in entries:
+        missing = [key for key in ["guild", "sheet", "threads"] if not entry.get(key)]
+        if (missing): raise ValueError(f"Tenant {entry} is missing {', '.join(missing)}")
+        config = {
+            "guild": int(entry["guild"]),
+            "sheet": str(entry["sheet"]),
+            "threads": int(entry["threads"]),
+            "hub": entry.get("hub") or None,
+            "digestChannel": int(entry["digestChannel"]) if entry.get("digestChannel") else None,
+            "requestsPerMinute": float(entry["requestsPerMinute"]) if entry.get("requestsPerMinute") else None,
+            "snapshotPath": entry.get("snapshotPath") or None
+        }
+        if (config["snapshotPath"] is None):
+            root, extension = os.path.splitext(snapshotPath)
+            config["snapshotPath"] = f"{root}_{config['guild']}{extension}" if len(entries) > 1 else snapshotPath
+        configs.append(config)
+    guilds = [config["guild"] for config in configs]
+    if (len(set(guilds)) != len(guilds)): raise ValueError("Two tenants cannot share a guild")
+    return configs
+
+class Tenant:
+    """
+    One tournament served by the bot: a Discord server, the spreadsheet its matches are kept in, and the channel its match threads are made in.
+
+    Every tenant has its own MatchStore and SheetScheduler, so one event's snapshots and Sheets quota never hold up another's.
+    Tenants share the thread pool Sheets calls run on and the authorized Google session behind openSpreadsheet.
+
+    Args:
+        guildID: Discord ID of the tournament's server
+        sheetKey: Key of the spreadsheet holding the data and guruData worksheets
+        threadsChannelID: Discord ID of the channel match threads are made in
+        openSpreadsheet: A function taking a sheet key and returning the opened gspread Spreadsheet. It is called on the thread pool
+        executor: The thread pool Sheets calls run on
+        scheduler: The SheetScheduler for this tenant's Sheets calls
+        hubKey: Key of the guru match hub spreadsheet, if there is one
+        digestChannelID: Discord ID of the channel change digests are posted to, if any
+        storeOptions: Keyword arguments for the tenant's MatchStore
+    """
+    def __init__(self, guildID: int, sheetKey: str, threadsChannelID: int, openSpreadsheet, executor, scheduler: SheetScheduler, hubKey: str=None, digestChannelID: int=None, **storeOptions):
+        self.guildID = guildID
+        self.sheetKey = sheetKey
+        self.threadsChannelID = threadsChannelID
+        self.hubKey = hubKey
+        self.digestChannelID = digestChannelID
+        self.scheduler = scheduler
+        self.matchSheet = AsyncWorksheet(lambda: openSpreadsheet(sheetKey).worksheet("data"), executor, scheduler)
+        self.guruSheet = AsyncWorksheet(lambda: openSpreadsheet(sheetKey).worksheet("guruData"), executor, scheduler)
+        self.store = MatchStore(self.matchSheet, self.guruSheet, **storeOptions)
+        self.warmedUp = asyncio.Event()
+
+    def isWarm(self):
+        """Returns whether commands can be answered: the sheets are open, or a snapshot saved on disk can be served until they are."""
+        return self.warmedUp.is_set() or self.store.peekMatches() is not None
+
+    async def warmUp(self):
+        """
+        Loads saved snapshots and opens both worksheets, then lets this tenant's commands through.
+        Metrics recorded by the warm-up and by the store's background refresh loop it starts are kept under this tenant's guild ID.
+        """
+        metricsScope.set(self.guildID)
+        start = time.perf_counter()
+        try:
+            await asyncio.gather(self.store.start(), self.matchSheet.open(), self.guruSheet.open())
+            print(f"Warmed up guild {self.guildID} in {time.perf_counter() - start:.1f}s")
+        except Exception as e:
+            print(f"Could not open the spreadsheet of guild {self.guildID} while warming up, it will be retried on first use: {e}")
+        metrics.observe("startup.warmUp", time.perf_counter() - start)
+        self.warmedUp.set()
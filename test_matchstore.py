@@ -0,0 +1,190 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from fakesheets import FakeWorksheet, GURU_HEADER, DATA_HEADER, generateTournament
+from changelog import THREAD_LINKED
+from gururegistry import EMPTY_SIGNATURE, EMPTY_GURUID, REGISTERED
+from matchstore import MatchStore
+from sheetio import AsyncWorksheet, SheetScheduler, QuotaExhausted, sheetPriority, PRIORITY_WRITE, PRIORITY_READ, PRIORITY_BACKGROUND
+
+class FailingWorksheet(FakeWorksheet):
+    def batch_update(self, data: list, **kwargs):
+        self._request("batch_update")
+        raise RuntimeError("write failed")
+
+class StaleReadWorksheet(FakeWorksheet):
+    """Returns reads as the sheet was when the call started, readDelay seconds later."""
+    readDelay = 0
+
+    def _stale(self, result):
+        time.sleep(self.readDelay)
+        return result
+
+    def get_all_records(self, **kwargs):
+        return self._stale(super().get_all_records(**kwargs))
+
+    def get_all_values(self, **kwargs):
+        return self._stale(super().get_all_values(**kwargs))
+
+    def batch_get(self, ranges, **kwargs):
+        return self._stale(super().batch_get(ranges, **kwargs))
+
+class SlowWriteWorksheet(FakeWorksheet):
+    """Takes the next of writeDelays seconds before applying each batch_update."""
+    writeDelays = []
+
+    def batch_update(self, data: list, **kwargs):
+        if (self.writeDelays): time.sleep(self.writeDelays.pop(0))
+        return super().batch_update(data, **kwargs)
+
+def makeStore(guruValues: list, writeWindow: float=0.5, matchSheet: FakeWorksheet=None, scheduler: SheetScheduler=None):
+    executor = ThreadPoolExecutor(max_workers=4)
+    guruSheet = StaleReadWorksheet(guruValues, title="guruData")
+    matchSheet = matchSheet if matchSheet is not None else FakeWorksheet([["FID"]])
+    store = MatchStore(AsyncWorksheet(matchSheet, executor, scheduler), AsyncWorksheet(guruSheet, executor, scheduler), writeWindow=writeWindow)
+    return store, guruSheet
+
+def test_reload_during_write_window_keeps_queued_registration():
+    store, guruSheet = makeStore([GURU_HEADER] + [[EMPTY_SIGNATURE, EMPTY_GURUID]] * 3)
+
+    async def run():
+        await store.getGurus()
+        alice = asyncio.create_task(store.registerGuru("alice", 1))
+        await asyncio.sleep(0.1)
+        await store.refreshGurus()
+        bob = asyncio.create_task(store.registerGuru("bob", 2))
+        return await alice, await bob
+
+    (aliceStatus, aliceID), (bobStatus, bobID) = asyncio.run(run())
+    assert (aliceStatus, bobStatus) == (REGISTERED, REGISTERED)
+    assert guruSheet.values[1:3] == [["alice", "1"], ["bob", "2"]]
+    assert store._gurus.getID("alice") == "1"
+    assert store._gurus.getRow("bob") == 3
+
+def test_reload_straddling_flush_keeps_confirmed_registration():
+    store, guruSheet = makeStore([GURU_HEADER] + [[EMPTY_SIGNATURE, EMPTY_GURUID]] * 3, writeWindow=0.1)
+
+    async def run():
+        await store.getGurus()
+        guruSheet.readDelay = 0.3
+        alice = asyncio.create_task(store.registerGuru("alice", 1))
+        await asyncio.sleep(0)
+        reload = asyncio.create_task(store.refreshGurus())
+        assert (await alice)[0] == REGISTERED
+        await reload
+        guruSheet.readDelay = 0
+        assert (await store.registerGuru("bob", 2))[0] == REGISTERED
+        await store.refreshGurus()
+
+    asyncio.run(run())
+    assert guruSheet.values[1:3] == [["alice", "1"], ["bob", "2"]]
+    assert store._gurus.getRow("alice") == 2
+    assert store._pendingGuruRows == {}
+
+def test_reload_during_write_window_keeps_queued_unregistration():
+    store, guruSheet = makeStore([GURU_HEADER, ["alice", "1"], [EMPTY_SIGNATURE, EMPTY_GURUID]])
+
+    async def run():
+        await store.getGurus()
+        unregister = asyncio.create_task(store.unregisterGuru("alice", 1))
+        await asyncio.sleep(0.1)
+        await store.refreshGurus()
+        assert store._gurus.getID("alice") is None
+        await store.registerGuru("bob", 2)
+        await unregister
+
+    asyncio.run(run())
+    assert guruSheet.values[1:3] == [["bob", "2"], [EMPTY_SIGNATURE, EMPTY_GURUID]]
+
+def test_link_is_logged_once_written():
+    dataValues, guruValues = generateTournament(1, 4, 4)
+    store, guruSheet = makeStore(guruValues, 0.05, FakeWorksheet(dataValues))
+    thread = 10**18 + 12345
+
+    async def run():
+        await store.refreshMatches()
+        write = asyncio.create_task(store.updateMatchCell(2, DATA_HEADER.index('TLink') + 1, thread))
+        await asyncio.sleep(0)
+        assert store.changes.since(0) == []
+        await write
+
+    asyncio.run(run())
+    assert [(change.kind, change.value) for change in store.changes.since(0)] == [(THREAD_LINKED, str(thread))]
+
+def test_failed_link_is_never_logged():
+    dataValues, guruValues = generateTournament(1, 4, 4)
+    store, guruSheet = makeStore(guruValues, 0.05, FailingWorksheet(dataValues))
+
+    async def run():
+        await store.refreshMatches()
+        with pytest.raises(RuntimeError):
+            await store.updateMatchCell(2, DATA_HEADER.index('TLink') + 1, 10**18 + 12345)
+        await store.getMatches()
+
+    asyncio.run(run())
+    assert store.changes.since(0) == []
+
+def test_sync_straddling_flush_keeps_written_link():
+    dataValues, guruValues = generateTournament(1, 4, 4)
+    matchSheet = StaleReadWorksheet(dataValues)
+    store, guruSheet = makeStore(guruValues, 0.1, matchSheet)
+    thread = 10**18 + 12345
+
+    async def run():
+        await store.refreshMatches()
+        matchSheet.readDelay = 0.3
+        write = asyncio.create_task(store.updateMatchCell(2, DATA_HEADER.index('TLink') + 1, thread))
+        await asyncio.sleep(0)
+        refresh = asyncio.create_task(store.refreshMatches())
+        await write
+        await refresh
+        assert store.peekMatches().table[0].TLink == thread
+        assert len(store.peekMatches().table.linkedTo(thread)) == 1
+        matchSheet.readDelay = 0
+        await store.refreshMatches()
+
+    asyncio.run(run())
+    assert store.peekMatches().table[0].TLink == thread
+    assert store._pendingMatchCells == {}
+    assert [change.kind for change in store.changes.since(0)] == [THREAD_LINKED]
+
+def test_later_batch_waits_for_slow_earlier_batch():
+    dataValues, guruValues = generateTournament(1, 4, 4)
+    matchSheet = SlowWriteWorksheet(dataValues)
+    store, guruSheet = makeStore(guruValues, 0.05, matchSheet)
+    col = DATA_HEADER.index('TLink') + 1
+
+    async def run():
+        await store.refreshMatches()
+        matchSheet.writeDelays = [0.3]
+        link = asyncio.create_task(store.updateMatchCell(2, col, 123))
+        await asyncio.sleep(0.1)
+        await store.updateMatchCell(2, col, 0)
+        await link
+
+    asyncio.run(run())
+    assert matchSheet.values[1][col - 1] == "0"
+    assert store.peekMatches().table[0].TLink == 0
+
+def test_command_joining_background_refresh_gets_its_own_max_wait():
+    dataValues, guruValues = generateTournament(1, 4, 4)
+    scheduler = SheetScheduler(maxWaits={PRIORITY_WRITE: 0.2, PRIORITY_READ: 0.2, PRIORITY_BACKGROUND: None})
+    store, guruSheet = makeStore(guruValues, 0.05, FakeWorksheet(dataValues), scheduler)
+
+    async def background():
+        sheetPriority.set(PRIORITY_BACKGROUND)
+        await store.refreshMatches()
+
+    async def run():
+        scheduler.pause(100)
+        refresh = asyncio.create_task(background())
+        await asyncio.sleep(0.1)
+        with pytest.raises(QuotaExhausted):
+            await asyncio.wait_for(store.getMatches(), 2)
+        with pytest.raises(QuotaExhausted):
+            await refresh
+
+    asyncio.run(run())
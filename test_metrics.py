@@ -0,0 +1,24 @@
+import asyncio
+
+from metrics import Metrics, metricsScope
+
+def test_metrics_are_kept_apart_by_scope():
+    metrics = Metrics()
+
+    async def tenant(guildID, calls):
+        metricsScope.set(guildID)
+        for call in range(calls):
+            metrics.observe("sheets.data.batch_get", 0.01)
+            metrics.hit("store.matches", call > 0)
+
+    async def run():
+        await asyncio.gather(tenant(11, 3), tenant(12, 1))
+
+    asyncio.run(run())
+    assert metrics.histograms["sheets.11.data.batch_get"].count == 3
+    assert metrics.histograms["sheets.12.data.batch_get"].count == 1
+    assert "sheets.data.batch_get" not in metrics.histograms
+    report = "".join(metrics.report("sheets.", 12))
+    assert "`sheets.data.batch_get` 1 calls" in report and "11" not in report
+    assert metrics.report("store.", 11) == ["\n`store.matches` 67% hits of 3"]
+    assert metrics.report("", 13) == []
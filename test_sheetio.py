@@ -0,0 +1,25 @@
+import asyncio
+
+from sheetio import SheetScheduler, SingleFlight, sheetPriority, PRIORITY_READ, PRIORITY_BACKGROUND
+
+def test_joined_background_read_overtakes_other_background_reads():
+    scheduler = SheetScheduler(requestsPerMinute=600, burst=1)
+    order = []
+
+    async def call(name):
+        order.append(name)
+
+    async def background(name):
+        sheetPriority.set(PRIORITY_BACKGROUND)
+        await flights.do(name, scheduler.run, PRIORITY_BACKGROUND, lambda: call(name))
+
+    async def run():
+        scheduler.pause(0.1)
+        waiting = [asyncio.create_task(background(name)) for name in ["first", "second", "joined"]]
+        await asyncio.sleep(0)
+        await flights.do("joined", scheduler.run, PRIORITY_READ, lambda: call("command"))
+        await asyncio.gather(*waiting)
+
+    flights = SingleFlight()
+    asyncio.run(run())
+    assert order == ["joined", "first", "second"]
@@ -0,0 +1,47 @@
+def threadOfCell(link):
+    """Returns the thread ID stored in a TLink cell, or 0 if the cell does not hold a link."""
+    try:
+        return int(link)
+    except (ValueError, TypeError):
+        return 0
+
+class ThreadIndex:
+    """
+    Two-way map between matches and the threads linked to them, so thread-centric commands never scan the match table.
+
+    Args:
+        rowToThread: A dictionary of row position to thread ID, holding only linked rows
+    """
+    def __init__(self, rowToThread: dict):
+        self.rowToThread = rowToThread
+        self.threadToRows = {}
+        for row, thread in rowToThread.items():
+            self.threadToRows.setdefault(thread, set()).add(row)
+
+    @classmethod
+    def build(cls, links: list):
+        """Builds the index from the TLink cell of every match row, in sheet order."""
+        links = map(threadOfCell, links)
+        return cls({row: thread for row, thread in enumerate(links) if thread != 0})
+
+    def updated(self, links: dict):
+        """
+        Returns a new index with some rows relinked, leaving this one untouched for snapshots still using it.
+
+        Args:
+            links: A dictionary of row position to the row's new TLink cell value
+        """
+        rowToThread = dict(self.rowToThread)
+        for row, link in links.items():
+            thread = threadOfCell(link)
+            if (thread != 0): rowToThread[row] = thread
+            else: rowToThread.pop(row, None)
+        return ThreadIndex(rowToThread)
+
+    def rowsOf(self, thread: int):
+        """Returns the row positions of every match linked to a thread, in sheet order."""
+        return sorted(self.threadToRows.get(thread, ()))
+
+    def threadOf(self, row: int):
+        """Returns the thread ID linked to the match at a row position, or 0 if there is none."""
+        return self.rowToThread.get(row, 0)
@@ -0,0 +1,59 @@
+import asyncio
+
+from metrics import metrics
+
+class WriteQueue:
+    """
+    Write-behind queue that coalesces cell updates to one worksheet into a single batch_update.
+
+    Updates queued within window seconds of the first pending update are sent together.
+    When the same range is written more than once in a window only the last value is sent.
+    Every caller waits for the batch its update went out in, and sees the batch's exception if it failed.
+    A batch is not sent until the one before it has finished, so later writes to a cell always land after earlier ones.
+
+    Args:
+        worksheet: The worksheet to write to, wrapped in an AsyncWorksheet
+        window: Seconds to wait for more updates before flushing
+    """
+    def __init__(self, worksheet, window: float=0.5):
+        self.worksheet = worksheet
+        self.window = window
+        self._pending = {}
+        self._waiters = []
+        self._flushTask = None
+        self._sendingTask = None
+
+    async def updateCell(self, row: int, col: int, value):
+        """Queues a single cell write and waits until it has been flushed."""
+        from gspread.utils import rowcol_to_a1
+        await self.updateRange(rowcol_to_a1(row, col), [[value]])
+
+    async def updateRange(self, rangeName: str, values: list):
+        """Queues a write of a block of values in A1 notation and waits until it has been flushed."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.pop(rangeName, None)
+        self._pending[rangeName] = values
+        self._waiters.append(future)
+        if (self._flushTask is None):
+            self._flushTask = asyncio.create_task(self._flushAfterWindow())
+        await future
+
+    async def _flushAfterWindow(self):
+        await asyncio.sleep(self.window)
+        pending, waiters = self._pending, self._waiters
+        self._pending, self._waiters = {}, []
+        self._flushTask = None
+        previous, self._sendingTask = self._sendingTask, asyncio.current_task()
+        if (previous is not None and not previous.done()): await asyncio.wait([previous])
+        data = [{"range": rangeName, "values": values} for rangeName, values in pending.items()]
+        metrics.count("writes.batches")
+        metrics.count("writes.ranges", len(data))
+        metrics.count("writes.coalesced", len(waiters) - len(data))
+        try:
+            await self.worksheet.batch_update(data, raw=False)
+        except Exception as e:
+            for future in waiters:
+                if (not future.done()): future.set_exception(e)
+            return
+        for future in waiters:
+            if (not future.done()): future.set_result(None)